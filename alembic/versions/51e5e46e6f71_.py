@@ -0,0 +1,49 @@
+"""empty message
+
+Revision ID: 51e5e46e6f71
+Revises: 9518275a9398
+Create Date: 2026-10-18 02:46:18.783360
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '51e5e46e6f71'
+down_revision: Union[str, Sequence[str], None] = '9518275a9398'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# posts per backfill statement, keeps each UPDATE short on a big table
+BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('posts', sa.Column('like_count', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+    # env.py runs the whole upgrade in one transaction, which would hold the ADD COLUMN's
+    # ACCESS EXCLUSIVE lock on posts through every batch. Outside of it the column is committed
+    # first and each batch commits on its own, locking only the rows it updates
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        max_id = conn.execute(sa.text("SELECT max(id) FROM posts")).scalar() or 0
+        for start in range(0, max_id + 1, BATCH_SIZE):
+            conn.execute(
+                sa.text(
+                    "UPDATE posts SET like_count = counts.n "
+                    "FROM (SELECT post_id, count(*) AS n FROM likes "
+                    "      WHERE post_id >= :start AND post_id < :end GROUP BY post_id) AS counts "
+                    "WHERE posts.id = counts.post_id"
+                ),
+                {"start": start, "end": start + BATCH_SIZE},
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('posts', 'like_count')
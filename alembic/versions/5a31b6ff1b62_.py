@@ -0,0 +1,39 @@
+"""empty message
+
+Revision ID: 5a31b6ff1b62
+Revises: adf7bd4c7585
+Create Date: 2026-10-18 03:01:21.332583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a31b6ff1b62'
+down_revision: Union[str, Sequence[str], None] = 'adf7bd4c7585'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('follows',
+    sa.Column('follower_id', sa.Integer(), nullable=False),
+    sa.Column('followee_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+    sa.ForeignKeyConstraint(['followee_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['follower_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('follower_id', 'followee_id')
+    )
+    op.create_index(op.f('ix_follows_followee_id'), 'follows', ['followee_id'], unique=False)
+    op.add_column('users', sa.Column('follower_count', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'follower_count')
+    op.drop_index(op.f('ix_follows_followee_id'), table_name='follows')
+    op.drop_table('follows')
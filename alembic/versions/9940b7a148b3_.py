@@ -0,0 +1,28 @@
+"""empty message
+
+Revision ID: 9940b7a148b3
+Revises: e18426518380
+Create Date: 2026-10-18 03:08:44.697488
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9940b7a148b3'
+down_revision: Union[str, Sequence[str], None] = 'e18426518380'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('is_superuser', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'is_superuser')
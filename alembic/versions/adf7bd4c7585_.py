@@ -0,0 +1,51 @@
+"""empty message
+
+Revision ID: adf7bd4c7585
+Revises: 6ea47c7a9bf5
+Create Date: 2026-10-18 02:59:16.218616
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'adf7bd4c7585'
+down_revision: Union[str, Sequence[str], None] = '6ea47c7a9bf5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# posts per backfill statement, same as the like_count backfill
+BATCH_SIZE = 10000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('likes', sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False))
+
+    # nobody knows when the existing likes were made. Dating them at their post's creation keeps
+    # them from all looking brand new and flooding the trending ranking on deploy.
+    # Outside the migration's transaction, like the like_count backfill: the ADD COLUMN commits
+    # first, each batch commits on its own, and /like isn't blocked until the whole thing is done
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        max_id = conn.execute(sa.text("SELECT max(id) FROM posts")).scalar() or 0
+        for start in range(0, max_id + 1, BATCH_SIZE):
+            conn.execute(
+                sa.text(
+                    "UPDATE likes SET created_at = posts.created_at FROM posts "
+                    "WHERE posts.id = likes.post_id AND posts.created_at IS NOT NULL "
+                    "AND likes.post_id >= :start AND likes.post_id < :end"
+                ),
+                {"start": start, "end": start + BATCH_SIZE},
+            )
+        # after the backfill, so it isn't kept up to date through it, and without blocking writes
+        op.create_index(op.f('ix_likes_created_at'), 'likes', ['created_at'], unique=False, postgresql_concurrently=True)
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_likes_created_at'), table_name='likes')
+    op.drop_column('likes', 'created_at')
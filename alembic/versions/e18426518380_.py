@@ -0,0 +1,43 @@
+"""empty message
+
+Revision ID: e18426518380
+Revises: 5a31b6ff1b62
+Create Date: 2026-10-18 03:02:12.675339
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e18426518380'
+down_revision: Union[str, Sequence[str], None] = '5a31b6ff1b62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# every column holding a users.id, the foreign keys have to widen with the key they point at
+USER_ID_COLUMNS = [
+    ('users', 'id'),
+    ('posts', 'owner_id'),
+    ('likes', 'user_id'),
+    ('follows', 'follower_id'),
+    ('follows', 'followee_id'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ids are now 64-bit snowflakes (app/ids.py). The existing ones (100-99999) keep their value,
+    # they sort before every new id and can't collide with one
+    for table, column in USER_ID_COLUMNS:
+        op.alter_column(table, column, existing_type=sa.Integer(), type_=sa.BigInteger(), existing_nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # only possible while no snowflake id has been handed out yet, they don't fit in 32 bits
+    for table, column in reversed(USER_ID_COLUMNS):
+        op.alter_column(table, column, existing_type=sa.BigInteger(), type_=sa.Integer(), existing_nullable=False)
@@ -0,0 +1,34 @@
+"""empty message
+
+Revision ID: ec142e65da53
+Revises: 9940b7a148b3
+Create Date: 2026-10-18 03:23:44.743866
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ec142e65da53'
+down_revision: Union[str, Sequence[str], None] = '9940b7a148b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # leases on the snowflake worker ids (app/id_leases.py), rows appear as processes take them
+    op.create_table('id_workers',
+    sa.Column('worker_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('holder', sa.String(length=255), nullable=False),
+    sa.Column('expires_at', sa.TIMESTAMP(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('worker_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('id_workers')
@@ -1,7 +1,22 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from fastapi import HTTPException, status
 from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
+from .config import settings
+from .instrumentation import phase
 
-# Initialize the hasher with recommended settings
-passwords = PasswordHash.recommended()
+# Argon2 with the cost from settings, tune it for your hardware with `python -m app.calibrate_hash`.
+# Hashes made with other parameters still verify, and get upgraded on the next login.
+passwords = PasswordHash((
+    Argon2Hasher(
+        time_cost=settings.ARGON2_TIME_COST,
+        memory_cost=settings.ARGON2_MEMORY_COST,
+        parallelism=settings.ARGON2_PARALLELISM,
+    ),
+))
 
 def get_password_hash(password: str) -> str:
     """Converts plain text password to a secure hash."""
@@ -9,4 +24,72 @@ def get_password_hash(password: str) -> str:
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Checks if a plain password matches the stored hash....by hashing the plain text and comparing."""
-    return passwords.verify(plain_password, hashed_password)
\ No newline at end of file
+    return passwords.verify(plain_password, hashed_password)
+
+def verify_and_update(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """verify_password, plus a new hash when the stored one was made with outdated parameters."""
+    return passwords.verify_and_update(plain_password, hashed_password)
+
+
+# Argon2 is slow and memory hungry on purpose. Run inline it freezes every other request on
+# the worker, so it gets its own small process pool instead (the GIL would serialize threads).
+_executor: ProcessPoolExecutor | None = None
+# hashes queued or running, only ever touched from the event loop so no lock needed
+_pending = 0
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # spawn, not Linux's default fork: we're inside a running event loop with the driver's and
+        # the threadpool's threads alive, and a forked child can inherit one of their locks held
+        # forever. Each pool worker starts a fresh interpreter that imports this module (and the
+        # __main__ script if there is one, so scripts need their if __name__ guard)
+        _executor = ProcessPoolExecutor(max_workers=settings.HASH_POOL_SIZE, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+def _busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
+async def _run_in_pool(fn, *args):
+    global _pending, _executor
+    # backpressure: during a login storm shed load early instead of queueing until every client times out
+    if _pending >= settings.HASH_MAX_PENDING:
+        raise _busy()
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        executor = get_executor()
+        # queueing for a free worker included, that's what the request actually waits
+        with phase("hash"):
+            return await loop.run_in_executor(executor, fn, *args)
+    except BrokenProcessPool:
+        # a worker died (e.g. OOM killed at a high ARGON2_MEMORY_COST) and took the pool with it.
+        # Drop it so the next call starts a fresh one, this request is retried by the client
+        if _executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+        raise _busy()
+    finally:
+        _pending -= 1
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the hashing pool."""
+    return await _run_in_pool(get_password_hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the hashing pool."""
+    return await _run_in_pool(verify_password, plain_password, hashed_password)
+
+async def verify_and_update_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """verify_and_update on the hashing pool."""
+    return await _run_in_pool(verify_and_update, plain_password, hashed_password)
@@ -0,0 +1,68 @@
+"""Finds Argon2 parameters that fit a latency budget on this machine.
+
+    python -m app.calibrate_hash --target-ms 250
+
+Memory is raised first (it's what makes GPU cracking expensive), then time cost,
+keeping the median hash time under the target. Remember each worker runs
+HASH_POOL_SIZE of these at once, so leave headroom for the machine's RAM.
+"""
+import argparse
+import statistics
+import time
+
+from pwdlib.hashers.argon2 import Argon2Hasher
+
+# KiB, from the OWASP minimum (19 MiB) up
+MEMORY_STEPS = [19456, 32768, 65536, 131072, 262144, 524288, 1048576]
+
+
+def measure(time_cost: int, memory_cost: int, parallelism: int, rounds: int) -> float:
+    """Median milliseconds for one hash with these parameters."""
+    hasher = Argon2Hasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        hasher.hash("calibration-password")
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(target_ms: float, parallelism: int, max_memory_kib: int, max_time_cost: int, rounds: int):
+    best = None
+    for memory_cost in [m for m in MEMORY_STEPS if m <= max_memory_kib]:
+        fits_at_this_memory = False
+        for time_cost in range(1, max_time_cost + 1):
+            ms = measure(time_cost, memory_cost, parallelism, rounds)
+            print(f"  m={memory_cost // 1024:>5} MiB  t={time_cost:>2}  p={parallelism}  {ms:8.1f} ms")
+            if ms > target_ms:
+                break
+            fits_at_this_memory = True
+            best = (time_cost, memory_cost, ms)
+        if not fits_at_this_memory:
+            break
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target-ms", type=float, default=250.0, help="latency budget for one hash")
+    parser.add_argument("--parallelism", type=int, default=4)
+    parser.add_argument("--max-memory-mib", type=int, default=256)
+    parser.add_argument("--max-time-cost", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5, help="hashes per measurement")
+    args = parser.parse_args()
+
+    print(f"calibrating for {args.target_ms} ms per hash...")
+    best = calibrate(args.target_ms, args.parallelism, args.max_memory_mib * 1024, args.max_time_cost, args.rounds)
+    if best is None:
+        print("even the cheapest profile is over budget, raise --target-ms")
+        return
+    time_cost, memory_cost, ms = best
+    print(f"\nrecommended ({ms:.1f} ms per hash), put these in your .env:")
+    print(f"ARGON2_TIME_COST={time_cost}")
+    print(f"ARGON2_MEMORY_COST={memory_cost}")
+    print(f"ARGON2_PARALLELISM={args.parallelism}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,14 +6,99 @@ class Settings(BaseSettings):
     DB_USER: str
     DB_PASSWORD: str
     DB_NAME: str
-    DB_DRIVER: str = "psycopg2"
+    # asyncpg for postgres, or aiosqlite to run against a local sqlite file (DB_NAME) instead
+    DB_DRIVER: str = "asyncpg"
+
+    # connection pool, per worker process: total connections = workers * (size + overflow)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # 0-1023, must differ for every running process, not just per deployment (app/ids.py). Unset,
+    # each process leases a free one from the id_workers table for ID_WORKER_LEASE_SECONDS at a time
+    ID_WORKER_ID: int | None = None
+    ID_WORKER_LEASE_SECONDS: int = 60
 
     ALGORITHM: str
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
 
+    # authenticated users are cached per worker, a change made through another worker
+    # is picked up after at most AUTH_CACHE_TTL_SECONDS
+    AUTH_CACHE_TTL_SECONDS: float = 60.0
+    AUTH_CACHE_MAX_SIZE: int = 10000
+    # already verified bearer tokens -> claims, entries never outlive the token's own exp
+    TOKEN_CACHE_TTL_SECONDS: float = 300.0
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+
+    # argon2 runs on a process pool per worker, past HASH_MAX_PENDING queued hashes we answer 503
+    HASH_POOL_SIZE: int = 2
+    HASH_MAX_PENDING: int = 64
+    # argon2 cost (argon2-cffi defaults), memory is in KiB. Changing them rehashes users as they log in
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536
+    ARGON2_PARALLELISM: int = 4
+
+    # write-behind for /like: buffer calls per worker and write them in batches, answers 202
+    LIKE_WRITE_BEHIND: bool = False
+    LIKE_FLUSH_INTERVAL_MS: int = 200
+    LIKE_FLUSH_MAX_EVENTS: int = 500
+
+    # cached JSON bodies of the read endpoints: "memory" (per worker), "redis" or "off"
+    RESPONSE_CACHE_BACKEND: str = "memory"
+    RESPONSE_CACHE_TTL_SECONDS: float = 30.0
+    RESPONSE_CACHE_MAX_SIZE: int = 2048
+    REDIS_URL: str = "redis://localhost:6379/0"
+
+    # build the list responses from their row tuples with model_construct instead of validating
+    # every field again (see app/serialization.py)
+    FAST_SERIALIZATION: bool = False
+
+    # GET /posts/trending: likes lose half their weight every half-life and stop counting after the
+    # window, the ranking is rebuilt from the likes table at least this often
+    TRENDING_HALF_LIFE_HOURS: float = 6.0
+    TRENDING_WINDOW_HOURS: float = 48.0
+    TRENDING_REFRESH_SECONDS: float = 60.0
+    TRENDING_MAX_POSTS: int = 1000
+
+    # GET /posts/timeline: newest post ids kept per user, pushed on write except for accounts with
+    # this many followers (merged on read). memory is per worker, redis shares them (uses REDIS_URL)
+    TIMELINE_BACKEND: str = "memory"
+    TIMELINE_SIZE: int = 800
+    TIMELINE_FANOUT_MAX_FOLLOWERS: int = 10000
+    TIMELINE_MAX_USERS: int = 10000
+    TIMELINE_TTL_SECONDS: float = 3600.0
+
+    # per request timing (app/instrumentation.py): Prometheus text at GET /metrics, and a
+    # Server-Timing header with the db/auth/hash/serialize split for the browser's devtools
+    INSTRUMENTATION: bool = True
+    SERVER_TIMING: bool = True
+
+    # opt-in slow query log (app/slow_queries.py): statements over SLOW_QUERY_MS are logged and
+    # totalled per fingerprint at /metrics/slow_queries, this fraction of the slow SELECTs get an EXPLAIN
+    SLOW_QUERY_LOG: bool = False
+    SLOW_QUERY_MS: float = 200.0
+    SLOW_QUERY_EXPLAIN_SAMPLE: float = 0.0
+    SLOW_QUERY_MAX_FINGERPRINTS: int = 500
+
+    # longest a superuser can run the sampling profiler (GET /debug/profile) for in one go
+    PROFILER_MAX_SECONDS: float = 60.0
+
+    # most posts accepted by one POST /posts/bulk
+    POSTS_BULK_MAX: int = 500
+    # rows fetched per round trip by the NDJSON exports
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # keyset pagination for the list endpoints, limit is capped server side
+    PAGE_SIZE_DEFAULT: int = 20
+    PAGE_SIZE_MAX: int = 100
+
     @property
     def sqlalchemy_database_url(self) -> str:
+        if self.DB_DRIVER == "aiosqlite":
+            return f"sqlite+aiosqlite:///{self.DB_NAME}"
         return f"postgresql+{self.DB_DRIVER}://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
     class Config:
@@ -1,15 +1,98 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from .config import settings
 
-engine = create_engine(settings.sqlalchemy_database_url)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class PoolStats:
+    """Running counters for connection checkouts, read through pool_status()."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+pool_stats = PoolStats()
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    """The default async QueuePool, plus how long each caller waited for its connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            pool_stats.checkouts += 1
+            pool_stats.wait_total += waited
+            pool_stats.wait_max = max(pool_stats.wait_max, waited)
+
+
+engine_options = {}
+if settings.DB_DRIVER != "aiosqlite":
+    # sqlite picks its own pool class, the sizing knobs only mean something for postgres
+    engine_options = dict(
+        poolclass=MeteredPool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+engine = create_async_engine(settings.sqlalchemy_database_url, **engine_options)
+# expire_on_commit=False: we still read the attributes after commit to build the response,
+# and an AsyncSession can't lazy load them back behind our back like the sync one did
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
-    try:
+# aiosqlite is only a stand-in for running without a postgres server (tests, local hacking)
+IS_SQLITE = engine.dialect.name == "sqlite"
+if IS_SQLITE:
+    # sqlite ignores foreign keys, ON DELETE CASCADE included, unless every connection asks for them
+    @event.listens_for(engine.sync_engine, "connect")
+    def _sqlite_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+# both dialects support INSERT ... ON CONFLICT, this is the insert() that matches the engine
+dialect_insert = sqlite.insert if IS_SQLITE else postgresql.insert
+
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+async def create_all():
+    """Creates the tables straight from the models, alembic owns the schema on postgres."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+def pool_status() -> dict:
+    """Snapshot of this worker's connection pool, for sizing it against the worker count."""
+    pool = engine.pool
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            # overflow() counts up from -size, it's only real overflow once it's positive
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+        )
+    checkouts = pool_stats.checkouts
+    status.update(
+        checkouts=checkouts,
+        checkout_timeouts=pool_stats.timeouts,
+        wait_avg_ms=round(pool_stats.wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+        wait_max_ms=round(pool_stats.wait_max * 1000, 3),
+    )
+    return status
@@ -1,44 +1,88 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, TIMESTAMP
-from sqlalchemy.orm import relationship
-from .database import Base
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Text, ForeignKey, TIMESTAMP, Index, text, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
+from .database import Base, IS_SQLITE
+from .ids import new_id
 from datetime import datetime, timezone
-import random
 
 
 class User(Base):
     __tablename__ = "users"
 
-    def generate_user_id():
-        return random.randint(100, 99999)
-
-    id = Column(Integer, primary_key=True, unique=True, index=True, default=generate_user_id)
+    # time ordered 64-bit ids, see app/ids.py. The old random 100-99999 ones are still valid
+    id = Column(BigInteger, primary_key=True, unique=True, index=True, default=new_id)
     username = Column(String(50), unique=True, nullable=False, index=True)
     email = Column(String(120), unique=True, nullable=False, index=True)
     # Stores the securely hashed password for the user
     hashed_password = Column(String(255), nullable=False)
     full_name = Column(String(100))
+    # admin only endpoints, e.g. the profiler (routers/debug.py)
+    is_superuser = Column(Boolean, nullable=False, default=False, server_default=text("false"))
+    # denormalized COUNT(*) of follows, decides whether their posts are fanned out (app/timeline.py)
+    follower_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
     created_at = Column(TIMESTAMP(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(TIMESTAMP(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
-    poster = relationship("Post", back_populates="owner")
+    # posts go with their owner through ON DELETE CASCADE, the ORM mustn't try to null owner_id first
+    poster = relationship("Post", back_populates="owner", passive_deletes=True)
 
 class Post(Base):
     __tablename__ = "posts"
 
     # Use autoincrement instead of random. It's safer and faster!
     id = Column(Integer, primary_key=True, unique=True, autoincrement=True, index=True, nullable=False)
-    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    owner_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
 
     title = Column(String(50), nullable=False, index=True)
     content = Column(Text, nullable=False)
-    
+    # denormalized COUNT(*) of likes, kept in step by like_post in the same transaction
+    like_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
 
     created_at = Column(TIMESTAMP(timezone=True), default=lambda: datetime.now(timezone.utc))
     updated_at = Column(TIMESTAMP(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
-    owner = relationship("User", back_populates="poster")
+    # every Post we hand out is serialized with its owner (PostResponse.owner), so load it in
+    # the same SELECT instead of one extra users query per post (owner_id is NOT NULL -> inner join)
+    owner = relationship("User", back_populates="poster", lazy="joined", innerjoin=True)
+
+    # keyset pagination walks these newest first, see routers/post.py
+    __table_args__ = (
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        Index("ix_posts_owner_id_created_at_id", "owner_id", "created_at", "id"),
+    )
+
+    if not IS_SQLITE:
+        # full-text search (app/search.py), postgres keeps it up to date by itself. Deferred so
+        # loading a Post never drags the vector along. sqlite uses an FTS5 table instead
+        search_vector = deferred(Column(TSVECTOR, Computed(
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(content, '')), 'B')",
+            persisted=True,
+        )))
+        __table_args__ += (Index("ix_posts_search_vector", "search_vector", postgresql_using="gin"),)
 
 class Likes(Base):
     __tablename__ = "likes"
 
     post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False, index=True ,primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True,primary_key=True)
\ No newline at end of file
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True,primary_key=True)
+    # when the like was made, the trending ranking (app/trending.py) scans recent ones by it
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, index=True, default=lambda: datetime.now(timezone.utc),
+                        server_default=text("CURRENT_TIMESTAMP"))
+
+class Follows(Base):
+    __tablename__ = "follows"
+
+    # follower_id first: "who do I follow" is the primary key prefix, the index covers "who follows them"
+    follower_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, primary_key=True)
+    followee_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True, primary_key=True)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc),
+                        server_default=text("CURRENT_TIMESTAMP"))
+
+
+class IdWorker(Base):
+    __tablename__ = "id_workers"
+
+    # leases on the worker ids of app/ids.py, one per running app process (app/id_leases.py)
+    worker_id = Column(Integer, primary_key=True, autoincrement=False)
+    holder = Column(String(255), nullable=False)
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
\ No newline at end of file
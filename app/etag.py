@@ -0,0 +1,28 @@
+import hashlib
+from fastapi import Request, Response, status
+
+# ETags here are hashes of the version columns (ids, updated_at, like counts...) of the rows
+# a response is built from, so checking one costs a narrow query and no serialization.
+
+
+def make_etag(versions) -> str:
+    """Strong ETag over a sequence of version tuples."""
+    digest = hashlib.blake2b(repr(list(versions)).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def not_modified(request: Request, etag: str) -> Response | None:
+    """A 304 when If-None-Match already names this etag, otherwise None."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    # weak validators (W/"...") match too, If-None-Match always uses the weak comparison
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    if "*" in candidates or etag in candidates:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=etag_headers(etag))
+    return None
+
+
+def etag_headers(etag: str) -> dict:
+    # private: these are authenticated responses, no shared proxy should keep them
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
@@ -0,0 +1,21 @@
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+from .config import settings
+from .database import SessionLocal
+
+# Full table dumps for the analytics jobs, one JSON object per line. Rows come off a server
+# side cursor EXPORT_BATCH_SIZE at a time and go straight out, so memory stays flat no matter
+# how big the table is.
+
+
+async def _ndjson_lines(query):
+    # its own session: the request's one is closed long before a big export finishes streaming
+    async with SessionLocal() as db:
+        result = await db.stream(query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield b"".join(to_json(dict(row._mapping)) + b"\n" for row in rows)
+
+
+def ndjson_response(query) -> StreamingResponse:
+    """Streams every row of a column select as NDJSON."""
+    return StreamingResponse(_ndjson_lines(query), media_type="application/x-ndjson")
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update
+from . import ids
+from .config import settings
+from .database import SessionLocal, dialect_insert
+from .db_models import IdWorker
+
+logger = logging.getLogger(__name__)
+
+# Every uvicorn/gunicorn worker is forked from the same environment, so a worker id from the
+# settings would be the same in all of them. Unless ID_WORKER_ID is set, each process leases one
+# of the 1024 worker ids in the id_workers table instead and renews the lease while it runs. A
+# lease nobody renewed is free for the next process to take.
+
+# how far two hosts' clocks may disagree, the lease is given up locally this much early
+CLOCK_SKEW = 5.0
+
+
+class WorkerIdLease:
+    def __init__(self, lease_seconds: float):
+        if lease_seconds <= 3 * CLOCK_SKEW:
+            raise ValueError(f"the worker id lease has to be longer than {3 * CLOCK_SKEW:g} seconds")
+        self.lease_seconds = lease_seconds
+        self.holder = ""
+        self.worker_id: int | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """Takes a free worker id for this process, new_id() uses it from here on."""
+        # here rather than in __init__, a preloading server imports us once before forking
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.worker_id = await self._acquire()
+        logger.info("leased worker id %d as %s", self.worker_id, self.holder)
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.worker_id is not None:
+            # handing it back early is a courtesy, the lease runs out by itself anyway
+            async with SessionLocal() as db:
+                await db.execute(
+                    update(IdWorker)
+                    .where(IdWorker.worker_id == self.worker_id, IdWorker.holder == self.holder)
+                    .values(expires_at=datetime.now(timezone.utc))
+                )
+                await db.commit()
+
+    async def _acquire(self) -> int:
+        async with SessionLocal() as db:
+            now = datetime.now(timezone.utc)
+            result = await db.execute(select(IdWorker.worker_id).where(IdWorker.expires_at > now))
+            taken = set(result.scalars().all())
+            for worker_id in range(ids.MAX_WORKER_ID + 1):
+                if worker_id in taken:
+                    continue
+                valid_until = time.monotonic() + self.lease_seconds - CLOCK_SKEW
+                expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)
+                # a row that's there and not expired means another process got to it first
+                stmt = dialect_insert(IdWorker).values(worker_id=worker_id, holder=self.holder, expires_at=expires_at)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[IdWorker.worker_id],
+                    set_={"holder": stmt.excluded.holder, "expires_at": stmt.excluded.expires_at},
+                    where=IdWorker.expires_at <= now,
+                ).returning(IdWorker.worker_id)
+                result = await db.execute(stmt)
+                if result.first() is not None:
+                    await db.commit()
+                    ids.use_worker_id(worker_id, valid_until)
+                    return worker_id
+        raise RuntimeError(f"all {ids.MAX_WORKER_ID + 1} worker ids are leased, can't generate user ids")
+
+    async def _renew(self) -> None:
+        valid_until = time.monotonic() + self.lease_seconds - CLOCK_SKEW
+        async with SessionLocal() as db:
+            result = await db.execute(
+                update(IdWorker)
+                .where(IdWorker.worker_id == self.worker_id, IdWorker.holder == self.holder)
+                .values(expires_at=datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds))
+                .returning(IdWorker.worker_id)
+            )
+            renewed = result.first() is not None
+            await db.commit()
+        if renewed:
+            ids.extend_lease(valid_until)
+        else:
+            # it ran out and somebody else has it now, the old id must not be used again
+            logger.error("lost the lease on worker id %d, leasing another one", self.worker_id)
+            self.worker_id = await self._acquire()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self._renew()
+            except Exception:
+                # new_id() stops by itself once the lease may have run out
+                logger.exception("renewing the worker id lease failed")
+
+
+worker_id_lease = WorkerIdLease(lease_seconds=settings.ID_WORKER_LEASE_SECONDS)
@@ -0,0 +1,85 @@
+import os
+import socket
+import threading
+import time
+import zlib
+from .config import settings
+
+# Snowflake style 64-bit ids: | 41 bits ms since EPOCH_MS | 10 bits worker | 12 bits sequence |
+# Unique without asking the database as long as no two running processes share a worker id, and
+# roughly time ordered, so new rows land at the right end of the primary key index instead of at
+# a random page of it. 41 bits of milliseconds last until 2094.
+EPOCH_MS = 1735689600000  # 2025-01-01 UTC
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+class IdGenerator:
+    """Hands out up to 4096 ids per millisecond per worker, waits for the next one past that."""
+
+    def __init__(self, worker_id: int):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker id must be between 0 and {MAX_WORKER_ID}")
+        self.worker_id = worker_id
+        self._last_ms = -1
+        self._sequence = 0
+        # ids are made from the threadpool too, not just the event loop
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            now = time.time_ns() // 1_000_000 - EPOCH_MS
+            # the clock stepped back (NTP): keep counting on the last millisecond, never reuse one
+            if now <= self._last_ms:
+                now = self._last_ms
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    while now <= self._last_ms:
+                        now = time.time_ns() // 1_000_000 - EPOCH_MS
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return (now << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+
+
+def default_worker_id() -> int:
+    # only for scripts run outside the app (benchmarks, seeding). Two live processes can hash to
+    # the same value, the app reserves its worker id in the database instead (app/id_leases.py)
+    return zlib.crc32(f"{socket.gethostname()}:{os.getpid()}".encode()) & MAX_WORKER_ID
+
+
+_generator: IdGenerator | None = None
+_generator_pid: int | None = None
+_generator_lock = threading.Lock()
+# time.monotonic() past which the leased worker id may already be someone else's, None: no lease
+_valid_until: float | None = None
+
+
+def use_worker_id(worker_id: int, valid_until: float | None = None) -> None:
+    """Makes new_id() use this worker id in this process, until `valid_until` if it's leased."""
+    global _generator, _generator_pid, _valid_until
+    with _generator_lock:
+        if _generator is None or _generator.worker_id != worker_id or _generator_pid != os.getpid():
+            _generator, _generator_pid = IdGenerator(worker_id), os.getpid()
+        _valid_until = valid_until
+
+
+def extend_lease(valid_until: float) -> None:
+    global _valid_until
+    _valid_until = valid_until
+
+
+def new_id() -> int:
+    global _generator, _generator_pid, _valid_until
+    # built lazily and again after a fork, a forked process mustn't inherit the parent's worker id
+    if _generator_pid != os.getpid():
+        with _generator_lock:
+            if _generator_pid != os.getpid():
+                worker_id = settings.ID_WORKER_ID if settings.ID_WORKER_ID is not None else default_worker_id()
+                _generator, _generator_pid, _valid_until = IdGenerator(worker_id), os.getpid(), None
+    if _valid_until is not None and time.monotonic() > _valid_until:
+        # the lease couldn't be renewed, another process may have taken the worker id over by now
+        raise RuntimeError(f"lease on worker id {_generator.worker_id} expired, not handing out ids")
+    return _generator.next_id()
@@ -0,0 +1,196 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from .config import settings
+
+# Where a request's time went. TimingMiddleware gives every request a RequestStats, the
+# engine events below add each SQL statement to it, and phase() marks the other expensive
+# parts (token checks, argon2, JSON encoding). What's left over is counted as "app".
+# The totals end up in the Server-Timing header and in the Prometheus text at GET /metrics.
+# Nothing here imports the database module: the argon2 pool's worker processes import
+# Pass_Hash_Algo, which uses phase(), and they have no business building an engine.
+
+# seconds, roughly the prometheus client defaults
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestStats:
+    __slots__ = ("scope", "sql_count", "sql_seconds", "phases")
+
+    def __init__(self, scope: dict):
+        # starlette writes the matched route into this same dict once the request is routed
+        self.scope = scope
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        # phase -> seconds, not counting SQL run inside the phase
+        self.phases: dict[str, float] = {}
+
+    @property
+    def route(self) -> str:
+        # the route's template, not the raw path, or every post id would be its own series
+        route = self.scope.get("route")
+        return route.path if route is not None else "unmatched"
+
+
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+
+@contextmanager
+def phase(name: str):
+    """Books the time spent in the block, minus its SQL, under `name` for the current request."""
+    stats = current_request.get()
+    if stats is None:
+        yield
+        return
+    start, sql_before = time.perf_counter(), stats.sql_seconds
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start - (stats.sql_seconds - sql_before)
+        stats.phases[name] = stats.phases.get(name, 0.0) + elapsed
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    # sqlalchemy runs this in a greenlet that shares the request's context, so these are its stats
+    stats = current_request.get()
+    if stats is not None:
+        stats.sql_count += 1
+        stats.sql_seconds += elapsed
+
+
+def instrument_engine(engine) -> None:
+    """Counts and times every statement the (async) engine runs against the current request."""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set, in the Prometheus text format."""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets: tuple[float, ...] = BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        # label values -> [count per bucket (last one is +Inf), sum]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, label_values: tuple, value: float) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total) in sorted(self._series.items()):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...]):
+        self.name, self.help, self.labels = name, help, labels
+        self._series: dict[tuple, float] = {}
+
+    def inc(self, label_values: tuple, value: float = 1) -> None:
+        self._series[label_values] = self._series.get(label_values, 0) + value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._series.items()):
+            lines.append(f"{self.name}{{{_labels(self.labels, label_values)}}} {value}")
+        return lines
+
+
+def _labels(names, values) -> str:
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in values)
+    return ",".join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+
+class Metrics:
+    def __init__(self):
+        self.requests = Counter("http_requests_total", "Requests handled.", ("method", "route", "status"))
+        self.duration = Histogram("http_request_duration_seconds", "Request latency.", ("method", "route", "status"))
+        self.phases = Counter("http_request_phase_seconds_total", "Request time by phase.", ("method", "route", "phase"))
+        self.sql_statements = Counter("http_request_sql_statements_total", "SQL statements run by requests.", ("method", "route"))
+        self.sql_time = Histogram("http_request_sql_seconds", "SQL time per request.", ("method", "route"))
+        # requests finish on the event loop, /metrics may be rendered from the threadpool
+        self._lock = threading.Lock()
+
+    def record(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        with self._lock:
+            self.requests.inc((method, route, status))
+            self.duration.observe((method, route, status), seconds)
+            self.sql_statements.inc((method, route), stats.sql_count)
+            self.sql_time.observe((method, route), stats.sql_seconds)
+            for name, value in breakdown(seconds, stats).items():
+                self.phases.inc((method, route, name), value)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            lines = []
+            for metric in (self.requests, self.duration, self.phases, self.sql_statements, self.sql_time):
+                lines.extend(metric.render())
+            return lines
+
+
+metrics = Metrics()
+
+
+def breakdown(total: float, stats: RequestStats) -> dict[str, float]:
+    """Seconds per phase for one request, "app" being whatever no other phase accounts for."""
+    phases = {"db": stats.sql_seconds, **stats.phases}
+    phases["app"] = max(0.0, total - sum(phases.values()))
+    return phases
+
+
+def server_timing(total: float, stats: RequestStats) -> bytes:
+    parts = [f'db;dur={stats.sql_seconds * 1000:.2f};desc="{stats.sql_count} queries"']
+    parts += [f"{name};dur={seconds * 1000:.2f}" for name, seconds in stats.phases.items()]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts).encode()
+
+
+class TimingMiddleware:
+    """Plain ASGI rather than BaseHTTPMiddleware: no extra task per request and streaming
+    responses pass straight through. The latency recorded runs until the last body chunk."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if settings.SERVER_TIMING:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(time.perf_counter() - start, stats)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            metrics.record(scope["method"], stats.route, status, time.perf_counter() - start, stats)
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+from collections import Counter
+from sqlalchemy import delete, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from .config import settings
+from .database import SessionLocal, dialect_insert
+from .db_models import Likes, Post, User
+
+logger = logging.getLogger(__name__)
+
+# rows per INSERT/DELETE statement, keeps us well under the driver's bind parameter limit
+CHUNK_SIZE = 1000
+
+
+async def bump_like_count(db: AsyncSession, post_id: int, delta: int) -> None:
+    # atomic in the database, and updated_at is pinned so a like doesn't look like an edit of the post
+    await db.execute(
+        update(Post)
+        .where(Post.id == post_id)
+        .values(like_count=Post.like_count + delta, updated_at=Post.updated_at)
+    )
+
+
+class LikeBuffer:
+    """Write-behind for /like: calls are queued in memory and written to the likes table in batches.
+
+    The last call for a (post_id, user_id) pair wins, so like/unlike/like inside one flush
+    window is a single row. A flush happens every `flush_interval` seconds, or as soon as
+    `max_events` distinct pairs are waiting, and once more on shutdown. A flush that fails puts
+    its batch back for the next one. Anything still queued when the process dies hard is lost,
+    that's the price of not committing per request.
+    """
+
+    def __init__(self, flush_interval: float, max_events: int):
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        # (post_id, user_id) -> dir
+        self._pending: dict[tuple[int, int], int] = {}
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self.events = 0
+        self.coalesced = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.dropped = 0
+
+    def add(self, post_id: int, user_id: int, dir: int) -> None:
+        key = (post_id, user_id)
+        if key in self._pending:
+            self.coalesced += 1
+        self._pending[key] = dir
+        self.events += 1
+        if len(self._pending) >= self.max_events:
+            self._wakeup.set()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            # no cancel(): a flush that's running would roll back a batch already taken out of
+            # _pending. The loop finishes what it's doing and stops on its own
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("final flush of buffered likes failed")
+            self.dropped += len(self._pending)
+            self._pending.clear()
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("flushing buffered likes failed, retrying with the next flush")
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            try:
+                async with SessionLocal() as db:
+                    written, skipped = await self._write(db, batch)
+                    await db.commit()
+            except BaseException:
+                # nothing of it was committed: put it back for the next flush, but calls made
+                # since the batch was taken are newer and win over the ones in it
+                for key, dir in batch.items():
+                    self._pending.setdefault(key, dir)
+                raise
+            self.flushes += 1
+            self.rows_written += written
+            self.dropped += skipped
+
+    async def _write(self, db: AsyncSession, batch: dict[tuple[int, int], int]) -> tuple[int, int]:
+        """Rows changed, and calls skipped because their post or user is gone."""
+        # likes on posts or by users that are gone would fail the whole multi-row insert on a
+        # foreign key, and a failed batch is retried, so they'd block every flush after it
+        result = await db.execute(select(Post.id).where(Post.id.in_({post_id for post_id, _ in batch})))
+        posts = set(result.scalars().all())
+        result = await db.execute(select(User.id).where(User.id.in_({user_id for _, user_id in batch})))
+        users = set(result.scalars().all())
+        live = {key: dir for key, dir in batch.items() if key[0] in posts and key[1] in users}
+        likes = [{"post_id": p, "user_id": u} for (p, u), dir in live.items() if dir == 1]
+        unlikes = [(p, u) for (p, u), dir in live.items() if dir == 0]
+        skipped = len(batch) - len(likes) - len(unlikes)
+
+        # RETURNING only gives back the rows that really changed, those are what the counters move by
+        deltas = Counter()
+        for i in range(0, len(likes), CHUNK_SIZE):
+            result = await db.execute(
+                dialect_insert(Likes).values(likes[i:i + CHUNK_SIZE]).on_conflict_do_nothing().returning(Likes.post_id)
+            )
+            deltas.update(result.scalars().all())
+        for i in range(0, len(unlikes), CHUNK_SIZE):
+            result = await db.execute(
+                delete(Likes).where(tuple_(Likes.post_id, Likes.user_id).in_(unlikes[i:i + CHUNK_SIZE])).returning(Likes.post_id)
+            )
+            deltas.subtract(result.scalars().all())
+
+        # sorted so two workers flushing at once lock the posts rows in the same order
+        for post_id in sorted(deltas):
+            if deltas[post_id]:
+                await bump_like_count(db, post_id, deltas[post_id])
+        return sum(abs(d) for d in deltas.values()), skipped
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.LIKE_WRITE_BEHIND,
+            "pending": len(self._pending),
+            "events": self.events,
+            "coalesced": self.coalesced,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "dropped": self.dropped,
+        }
+
+
+like_buffer = LikeBuffer(
+    flush_interval=settings.LIKE_FLUSH_INTERVAL_MS / 1000,
+    max_events=settings.LIKE_FLUSH_MAX_EVENTS,
+)
@@ -1,5 +1,13 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.routers import users, auth, post, like
+from app.routers import users, auth, post, like, metrics, debug
+from app import database, Pass_Hash_Algo, search
+from app.instrumentation import TimingMiddleware, instrument_engine
+from app.slow_queries import slow_query_log
+from app.like_buffer import like_buffer
+from app.trending import trending
+from app.id_leases import worker_id_lease
+from app.config import settings
 from fastapi.middleware.cors import CORSMiddleware
 
 # This function prints your name in ASCII when the script is loaded
@@ -31,7 +39,28 @@ Professional API implementation using FastAPI, PostgreSQL, and SQLAlchemy.
 ---
 """
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # no alembic on the sqlite stand-in, build the tables from the models instead
+    if database.IS_SQLITE:
+        await database.create_all()
+        await search.create_sqlite_fts()
+    # forked workers share the environment, so unless it's set per process each one leases its own
+    if settings.ID_WORKER_ID is None:
+        await worker_id_lease.start()
+    if settings.LIKE_WRITE_BEHIND:
+        like_buffer.start()
+    trending.start()
+    yield
+    await trending.close()
+    # write out whatever likes are still buffered before the engine goes away
+    await like_buffer.close()
+    Pass_Hash_Algo.shutdown_executor()
+    await worker_id_lease.close()
+    await database.engine.dispose()
+
 app = FastAPI(
+    lifespan=lifespan,
     title="WESLEY MADIKE API",
     description=description,
     version="1.0.0",
@@ -52,11 +81,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# added last so it's the outermost layer and its timings include CORS and everything below
+if settings.INSTRUMENTATION:
+    instrument_engine(database.engine)
+    app.add_middleware(TimingMiddleware)
+if settings.SLOW_QUERY_LOG:
+    slow_query_log.install(database.engine)
+
 # Routes
 app.include_router(users.router)
 app.include_router(auth.router)
 app.include_router(post.router)
 app.include_router(like.router)
+app.include_router(metrics.router)
+app.include_router(debug.router)
 
 @app.get("/", tags=["Root"])
 async def root():
@@ -0,0 +1,64 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, status
+from .config import settings
+
+# The cursor is opaque to clients: it's just the sort key ((created_at, id), (rank, id) for search
+# and trending, the post id for the timeline) of the last row they saw, json encoded and base64'd
+# so nobody starts building their own.
+
+
+def clamp_limit(limit: int) -> int:
+    """Caps the page size requested by the client to PAGE_SIZE_MAX."""
+    return max(1, min(limit, settings.PAGE_SIZE_MAX))
+
+
+def _encode(values: list) -> str:
+    raw = json.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> list:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    return json.loads(raw)
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Turns the sort key of the last row on a page into an opaque cursor."""
+    return _encode([created_at.isoformat(), row_id])
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Reverses encode_cursor, anything we did not hand out is a 400."""
+    try:
+        created_at, row_id = _decode(cursor)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def encode_rank_cursor(rank: float, row_id: int) -> str:
+    """Same as encode_cursor, for pages ordered by a relevance score."""
+    return _encode([rank, row_id])
+
+
+def decode_rank_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        rank, row_id = _decode(cursor)
+        return float(rank), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def encode_id_cursor(row_id: int) -> str:
+    """For pages ordered by id alone."""
+    return _encode([row_id])
+
+
+def decode_id_cursor(cursor: str) -> int:
+    try:
+        (row_id,) = _decode(cursor)
+        return int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
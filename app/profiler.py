@@ -0,0 +1,153 @@
+import os
+import re
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+# A sampling profiler for the worker it runs in. setitimer(ITIMER_PROF) sends the process a
+# SIGPROF for every `interval` seconds of CPU it burns, and the handler records the frame the
+# event loop thread was interrupted in plus the stacks of the other threads. Ticks follow CPU
+# time, so a worker that's idle isn't sampled at all, and the loop is caught wherever it is
+# rather than only when it gives up the GIL in select(). Nothing is hooked into the code being
+# profiled. Output is collapsed stacks (flamegraph.pl, speedscope, ...) or a speedscope JSON
+# document.
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the innermost frame of an event loop with nothing to do: the tick landed while it was in select()
+IDLE_FILES = ("selectors.py",)
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(APP_ROOT):
+        filename = os.path.relpath(filename, APP_ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _thread_cpu(ident: int) -> float | None:
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (OSError, AttributeError):
+        # the thread is gone, or there are no per-thread clocks on this platform
+        return None
+
+
+def _endpoints(routes, prefix: str = ""):
+    for route in routes:
+        included = getattr(route, "original_router", None)
+        if included is not None:
+            # newer FastAPI keeps an included router as one nested route instead of copying its routes
+            yield from _endpoints(included.routes, prefix + route.include_context.prefix)
+        elif getattr(route, "endpoint", None) is not None:
+            yield prefix + route.path, route.endpoint
+
+
+def endpoint_codes(routes, pattern: str) -> set:
+    """Code objects of the endpoints whose path matches the regex, for SamplingProfiler(only=...)."""
+    matcher = re.compile(pattern)
+    return {endpoint.__code__ for path, endpoint in _endpoints(routes) if matcher.search(path)}
+
+
+class SamplingProfiler:
+    """Samples the process on every `interval` seconds of CPU between start() and stop().
+
+    start() and stop() have to be called from the main thread, which is where signal handlers
+    run and where uvicorn runs the event loop. With `only`, a sample is kept only if one of
+    those code objects is on the stack, i.e. the thread is inside one of those endpoints right
+    then. Idle samples are skipped unless include_idle is set: the loop waiting in select(), and
+    other threads (threadpool workers, aiosqlite's connection threads) whose CPU clock hasn't
+    moved since the previous tick.
+    """
+
+    def __init__(self, interval: float, only: set | None = None, include_idle: bool = False):
+        self.interval = interval
+        self.only = only
+        self.include_idle = include_idle
+        # (thread name, label, ..., label) root first -> number of samples
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.elapsed = 0.0
+        # the handler only collects thread idents, threading.enumerate() takes a lock the
+        # interrupted code may be holding, so names are filled in by stop()
+        self._by_ident: Counter = Counter()
+        self._cpu: dict[int, float] = {}
+        self._previous_handler = None
+        self._started = 0.0
+
+    def start(self) -> None:
+        if not hasattr(signal, "setitimer"):
+            raise RuntimeError("the profiler needs signal.setitimer, which this platform doesn't have")
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("the profiler has to be started from the main thread")
+        self._previous_handler = signal.signal(signal.SIGPROF, self._tick)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self._started = time.perf_counter()
+
+    def stop(self) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler)
+        self.elapsed = time.perf_counter() - self._started
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for (ident, *labels), count in self._by_ident.items():
+            self.stacks[(names.get(ident, str(ident)), *labels)] += count
+
+    def _tick(self, signum, frame) -> None:
+        self.samples += 1
+        main = threading.main_thread().ident
+        if frame is not None and (self.include_idle or not frame.f_code.co_filename.endswith(IDLE_FILES)):
+            self._sample(main, frame)
+        for ident, other in sys._current_frames().items():
+            if ident == main:
+                # that's this handler, the loop's own stack is `frame`
+                continue
+            cpu = _thread_cpu(ident)
+            busy = cpu is None or cpu > self._cpu.get(ident, cpu)
+            if cpu is not None:
+                self._cpu[ident] = cpu
+            if busy or self.include_idle:
+                self._sample(ident, other)
+
+    def _sample(self, ident: int, frame) -> None:
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        if self.only is not None and self.only.isdisjoint(codes):
+            return
+        self._by_ident[(ident, *(_frame_label(code) for code in reversed(codes)))] += 1
+
+    def collapsed(self) -> str:
+        """One `frame;frame;...;leaf count` line per distinct stack, the thread as the root frame."""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def speedscope(self, name: str) -> dict:
+        """The profile in speedscope's file format, one sampled profile per thread."""
+        frames, index = [], {}
+        profiles = {}
+        for (thread_name, *labels), count in self.stacks.items():
+            stack = []
+            for label in labels:
+                if label not in index:
+                    index[label] = len(frames)
+                    func, _, location = label.partition(" (")
+                    file, _, line = location.rstrip(")").rpartition(":")
+                    frames.append({"name": func, "file": file, "line": int(line)})
+                stack.append(index[label])
+            profile = profiles.setdefault(thread_name, {"samples": [], "weights": []})
+            profile["samples"].append(stack)
+            profile["weights"].append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "app.profiler",
+            "shared": {"frames": frames},
+            "profiles": [
+                {"type": "sampled", "name": thread_name, "unit": "seconds", "startValue": 0,
+                 "endValue": sum(profile["weights"]), **profile}
+                for thread_name, profile in profiles.items()
+            ],
+        }
@@ -0,0 +1,117 @@
+from typing import Awaitable, Callable, Protocol
+from fastapi import Response
+from pydantic_core import to_json
+from .cache import TTLCache
+from .config import settings
+from .instrumentation import phase
+
+
+class CacheBackend(Protocol):
+    """What ResponseCache needs from a store. Redis (or anything speaking its protocol) fits."""
+
+    async def get(self, key: str) -> bytes | None: ...
+    async def set(self, key: str, value: bytes, ttl: float) -> None: ...
+    async def get_counter(self, key: str) -> int: ...
+    async def incr(self, key: str) -> int: ...
+
+
+class MemoryBackend:
+    """Per worker LRU, invalidations only reach this worker (the others catch up after the ttl)."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+        # counters never expire or get evicted, losing one would resurrect stale entries
+        self._counters: dict[str, int] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._cache.set(key, value, ttl=ttl)
+
+    async def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+
+class RedisBackend:
+    """Shared between workers, so an invalidation is seen everywhere at once. Needs `pip install redis`."""
+
+    def __init__(self, url: str):
+        from redis import asyncio as aioredis
+        self._redis = aioredis.from_url(url)
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._redis.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._redis.set(key, value, px=int(ttl * 1000))
+
+    async def get_counter(self, key: str) -> int:
+        return int(await self._redis.get(key) or 0)
+
+    async def incr(self, key: str) -> int:
+        return await self._redis.incr(key)
+
+
+class ResponseCache:
+    """Serialized JSON bodies of the read endpoints, keyed by route, user and page.
+
+    Keys live under a namespace ("posts", "users") with a generation number in them.
+    Invalidating a namespace bumps its generation, so every old key just stops being
+    looked up and ages out, no need to find and delete them one by one.
+    """
+
+    def __init__(self, backend: CacheBackend | None, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def cached_json(self, namespace: str, parts: tuple, build: Callable[[], Awaitable]) -> Response:
+        """Returns the cached body for namespace+parts, or awaits build() and caches what it returns."""
+        if self.backend is None:
+            return Response(content=await self._encode(build), media_type="application/json")
+        generation = await self.backend.get_counter(f"gen:{namespace}")
+        key = f"resp:{namespace}:{generation}:" + ":".join(str(p) for p in parts)
+        body = await self.backend.get(key)
+        if body is None:
+            self.misses += 1
+            body = await self._encode(build)
+            await self.backend.set(key, body, self.ttl)
+        else:
+            self.hits += 1
+        return Response(content=body, media_type="application/json")
+
+    async def _encode(self, build: Callable[[], Awaitable]) -> bytes:
+        data = await build()
+        with phase("serialize"):
+            return to_json(data)
+
+    async def invalidate(self, *namespaces: str) -> None:
+        if self.backend is None:
+            return
+        for namespace in namespaces:
+            await self.backend.incr(f"gen:{namespace}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def build_backend() -> CacheBackend | None:
+    if settings.RESPONSE_CACHE_BACKEND == "memory":
+        return MemoryBackend(max_size=settings.RESPONSE_CACHE_MAX_SIZE, ttl=settings.RESPONSE_CACHE_TTL_SECONDS)
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        return RedisBackend(settings.REDIS_URL)
+    return None
+
+response_cache = ResponseCache(build_backend(), ttl=settings.RESPONSE_CACHE_TTL_SECONDS)
@@ -1,5 +1,6 @@
 from fastapi import FastAPI, Depends, HTTPException, status,APIRouter
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 
 from app.db_models import User
@@ -22,14 +23,22 @@ router = APIRouter(
 '''
 
 @router.post("/login")
-def login(credentials: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(credentials: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     #verify user exists
-    db_user = db.query(User).filter(User.email == credentials.username).first()
+    result = await db.execute(select(User).where(User.email == credentials.username))
+    db_user = result.scalars().first()
     if not db_user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="incorrect credentials")
 
-    if not Pass_Hash_Algo.verify_password(credentials.password, db_user.hashed_password):
+    valid, new_hash = await Pass_Hash_Algo.verify_and_update_async(credentials.password, db_user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect credentials")
+
+    # the stored hash was made with older argon2 parameters, this is the only time we see the
+    # plain password so upgrade it now
+    if new_hash:
+        db_user.hashed_password = new_hash
+        await db.commit()
     
     #create token
     # We turn the integer 98512 into the string "98512"
@@ -0,0 +1,57 @@
+import asyncio
+import re
+from typing import Literal
+from fastapi import Depends, HTTPException, status, APIRouter, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.config import settings
+from app.profiler import SamplingProfiler, endpoint_codes
+from app.token import Principal, require_superuser
+
+router = APIRouter(
+    prefix="/debug",
+    tags=["Debug"]
+)
+
+# one profile at a time per worker, two samplers would just measure each other
+_profiling = asyncio.Lock()
+
+
+@router.get("/profile")
+async def profile_worker(request: Request, seconds: float = Query(10.0, gt=0), interval_ms: float = Query(5.0, ge=1, le=1000),
+                         format: Literal["collapsed", "speedscope"] = "collapsed", route: str | None = None,
+                         include_idle: bool = False, admin: Principal = Depends(require_superuser)):
+    """Samples this worker's stacks for `seconds` and returns them as collapsed stacks or speedscope JSON.
+
+    Only the worker that answers is profiled. `route` is a regex on route paths (e.g. `^/posts`),
+    with it only the time spent inside the matching endpoints is kept.
+    """
+    if seconds > settings.PROFILER_MAX_SECONDS:
+        raise HTTPException(status_code=422, detail=f"At most {settings.PROFILER_MAX_SECONDS} seconds")
+    only = None
+    if route is not None:
+        try:
+            only = endpoint_codes(request.app.routes, route)
+        except re.error as e:
+            raise HTTPException(status_code=422, detail=f"Invalid route pattern: {e}")
+        if not only:
+            raise HTTPException(status_code=422, detail="No route matches that pattern")
+    if _profiling.locked():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running on this worker")
+
+    async with _profiling:
+        profiler = SamplingProfiler(interval=interval_ms / 1000, only=only, include_idle=include_idle)
+        try:
+            profiler.start()
+        except RuntimeError as e:
+            raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+        # SIGPROF does the sampling, the event loop keeps serving the traffic being profiled meanwhile
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+
+    headers = {"X-Profile-Samples": str(profiler.samples)}
+    if format == "speedscope":
+        headers["Content-Disposition"] = 'attachment; filename="profile.speedscope.json"'
+        return JSONResponse(profiler.speedscope(name=f"{route or 'all routes'} for {seconds:g}s"), headers=headers)
+    return PlainTextResponse(profiler.collapsed(), headers=headers)
@@ -1,9 +1,15 @@
-from fastapi import Depends, HTTPException, status,APIRouter
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.schemas import Like
+from fastapi import Depends, HTTPException, status,APIRouter, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db, dialect_insert
+from app.schemas import Like, LikeStatus
 from app.token import verify_access_token
 from app.db_models import Likes
+from app.like_buffer import like_buffer, bump_like_count
+from app.config import settings
+from app.trending import trending
 
 router = APIRouter(
     tags=["Like"]
@@ -11,21 +17,58 @@ router = APIRouter(
 
 
 @router.post("/like", status_code=status.HTTP_201_CREATED)
-def like_post(like: Like, db: Session = Depends(get_db), current_user: int = Depends(verify_access_token)):
-    existing_like = db.query(Likes).filter(Likes.post_id == like.post_id, Likes.user_id == current_user.id).first()
-    
+async def like_post(like: Like, db: AsyncSession = Depends(get_db), current_user: int = Depends(verify_access_token)):
+    if settings.LIKE_WRITE_BEHIND:
+        # queued, not written yet, so there's no 404/409 to report: the flush skips no-op calls
+        like_buffer.add(like.post_id, current_user.id, like.dir)
+        if like.dir == 1:
+            # may be a repeat like the flush will skip, the next trending refresh corrects for that
+            trending.record_like(like.post_id)
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={"message": "Like queued"})
+
+    # no read before the write: the (post_id, user_id) primary key decides, and RETURNING tells us
+    # whether our statement was the one that changed anything, so concurrent calls can't double count
     if like.dir == 1:
-        if existing_like:
+        try:
+            result = await db.execute(
+                dialect_insert(Likes)
+                .values(post_id=like.post_id, user_id=current_user.id)
+                .on_conflict_do_nothing()
+                .returning(Likes.post_id)
+            )
+        except IntegrityError:
+            # ON CONFLICT swallows the duplicate, so what's left is the foreign key to posts
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+        if result.first() is None:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="You have already liked this post")
-        
-        new_like = Likes(post_id=like.post_id, user_id=current_user.id)
-        db.add(new_like)
-        db.commit()
+
+        await bump_like_count(db, like.post_id, 1)
+        await db.commit()
+        trending.record_like(like.post_id)
+        # no cache invalidation: like_count (and liked_by_me) are part of the feed ETags, and the
+        # ETag is part of the cache key, so the pages with this post simply miss under a new key
         return {"message": "Post liked successfully"}
     else:
-        if not existing_like:
+        result = await db.execute(
+            delete(Likes)
+            .where(Likes.post_id == like.post_id, Likes.user_id == current_user.id)
+            .returning(Likes.post_id)
+        )
+        if result.first() is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Like does not exist")
-        
-        db.delete(existing_like)
-        db.commit()
-        return {"message": "Post unliked successfully"}
\ No newline at end of file
+
+        await bump_like_count(db, like.post_id, -1)
+        await db.commit()
+        return {"message": "Post unliked successfully"}
+
+
+
+@router.get("/like/status", response_model=LikeStatus)
+async def like_status(post_ids: list[int] = Query(...), db: AsyncSession = Depends(get_db), current_user: int = Depends(verify_access_token)):
+    """Which of these posts the current user liked, for a whole feed page in one query."""
+    if len(post_ids) > settings.PAGE_SIZE_MAX:
+        raise HTTPException(status_code=422, detail=f"At most {settings.PAGE_SIZE_MAX} post ids per request")
+    result = await db.execute(select(Likes.post_id).where(Likes.user_id == current_user.id, Likes.post_id.in_(post_ids)))
+    liked = set(result.scalars().all())
+    return LikeStatus(liked={post_id: post_id in liked for post_id in post_ids})
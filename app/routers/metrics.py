@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from app.database import pool_status
+from app.token import Principal, principal_cache, require_superuser, token_cache
+from app.like_buffer import like_buffer
+from app.trending import trending
+from app.instrumentation import metrics
+from app.slow_queries import slow_query_log
+from app.response_cache import response_cache
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"]
+)
+
+# numbers are per worker process, scrape every worker if you run more than one
+
+@router.get("", response_class=PlainTextResponse)
+async def read_prometheus_metrics():
+    """Request latency, phase and SQL breakdowns per route, plus the pool, in the Prometheus text format."""
+    pool = pool_status()
+    lines = metrics.render()
+    lines += [
+        "# HELP db_pool_checkouts_total Connections checked out of the pool.",
+        "# TYPE db_pool_checkouts_total counter",
+        f"db_pool_checkouts_total {pool['checkouts']}",
+        "# HELP db_pool_checkout_timeouts_total Checkouts that gave up waiting for a connection.",
+        "# TYPE db_pool_checkout_timeouts_total counter",
+        f"db_pool_checkout_timeouts_total {pool['checkout_timeouts']}",
+    ]
+    if "checked_out" in pool:
+        lines += [
+            "# HELP db_pool_checked_out Connections in use right now.",
+            "# TYPE db_pool_checked_out gauge",
+            f"db_pool_checked_out {pool['checked_out']}",
+        ]
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+@router.get("/pool")
+async def read_pool_metrics():
+    return pool_status()
+
+@router.get("/cache")
+async def read_cache_metrics():
+    return {"principal": principal_cache.stats(), "token": token_cache.stats(), "response": response_cache.stats()}
+
+@router.get("/like_buffer")
+async def read_like_buffer_metrics():
+    return like_buffer.stats()
+
+@router.get("/trending")
+async def read_trending_metrics():
+    return trending.stats()
+
+# routes, our file:line and query plans are more than anonymous scrapers need to see
+@router.get("/slow_queries")
+async def read_slow_query_metrics(limit: int = 50, admin: Principal = Depends(require_superuser)):
+    return slow_query_log.report(limit)
@@ -1,62 +1,227 @@
-from fastapi import Depends, HTTPException, status,APIRouter
-from sqlalchemy.orm import Session
+from typing import Annotated
+from fastapi import Body, Depends, HTTPException, status,APIRouter, Query, Request
+from sqlalchemy import exists, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
 from app.database import get_db
-from app.schemas import PostCreate ,PostResponse
+from app.schemas import PostCreate ,PostResponse, PostPage, UserResponse
 from app.token import verify_access_token
-from app.db_models import Post
+from app.db_models import Post, User, Likes
+from app.pagination import clamp_limit, encode_cursor, decode_cursor, encode_rank_cursor, decode_rank_cursor, \
+    encode_id_cursor, decode_id_cursor
+from app.config import settings
+from app.response_cache import response_cache
+from app.etag import make_etag, not_modified, etag_headers
+from app.serialization import post_rows_query, post_from_row
+from app.export import ndjson_response
+from app.search import search_query
+from app.trending import trending
+from app.timeline import fan_out, timeline_page
 
 
 router = APIRouter(
     tags=["Post"]
 )   
 
+def keyset_query(query, limit: int, cursor: str | None):
+    """Newest first on the (created_at, id) index instead of OFFSET, one row more than the page."""
+    if cursor:
+        created_at, post_id = decode_cursor(cursor)
+        query = query.where(tuple_(Post.created_at, Post.id) < (created_at, post_id))
+    # the extra row tells us whether there is a next page without a COUNT(*)
+    return query.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit + 1)
+
+async def keyset_page(db: AsyncSession, limit: int, cursor: str | None, *where, liked_by: int | None = None) -> PostPage:
+    limit = clamp_limit(limit)
+    result = await db.execute(keyset_query(post_rows_query(*where, liked_by=liked_by), limit, cursor))
+    rows = result.all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return PostPage.model_construct(items=[post_from_row(row) for row in rows], next_cursor=next_cursor)
+
+async def page_etag(db: AsyncSession, limit: int, cursor: str | None, *where, liked_by: int | None = None) -> str:
+    """ETag of the page keyset_page would build, from the version columns of the same rows.
+
+    With liked_by, the viewer's liked_by_me flags are part of the page, so they're versioned too:
+    one like moving to another user leaves every like_count as it was.
+    """
+    columns = [Post.id, Post.updated_at, Post.like_count, User.updated_at]
+    if liked_by is not None:
+        columns.append(exists().where(Likes.post_id == Post.id, Likes.user_id == liked_by))
+    versions = select(*columns).join(User, User.id == Post.owner_id).where(*where)
+    result = await db.execute(keyset_query(versions, clamp_limit(limit), cursor))
+    return make_etag(result.all())
+
+async def posts_by_ids(db: AsyncSession, post_ids: list[int]) -> list[PostResponse]:
+    """The posts for a page of ids that was ranked elsewhere (trending, timeline), in that order.
+    Posts deleted since they were ranked are left out, so the page can come back short."""
+    if not post_ids:
+        return []
+    result = await db.execute(post_rows_query(Post.id.in_(post_ids)))
+    rows = {row.id: row for row in result.all()}
+    return [post_from_row(rows[post_id]) for post_id in post_ids if post_id in rows]
+
+async def get_post_or_404(db: AsyncSession, post_id: int) -> Post:
+    result = await db.execute(select(Post).where(Post.id == post_id))
+    db_post = result.scalars().first()
+    if not db_post:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+    return db_post
+
 @router.post("/posts", response_model=PostResponse, status_code=status.HTTP_201_CREATED)
-def create_post(post: PostCreate, db: Session = Depends(get_db), current_user: int = Depends(verify_access_token)):
+async def create_post(post: PostCreate, db: AsyncSession = Depends(get_db), current_user: int = Depends(verify_access_token)):
     new_post = Post(
         title=post.title,
         content=post.content,
         owner_id=current_user.id
     )
     db.add(new_post)
-    db.commit()
-    db.refresh(new_post)
+    await db.commit()
+    await response_cache.invalidate("posts")
+    await db.refresh(new_post)
+    await fan_out(db, current_user.id, [new_post.id])
     return new_post
 
-@router.get("/posts/my_posts", response_model=list[PostResponse])
-def get_posts(db: Session = Depends(get_db), current_user: int = Depends(verify_access_token)):
-    posts = db.query(Post).filter(Post.owner_id == current_user.id).all()
+@router.post("/posts/bulk", response_model=list[PostResponse], status_code=status.HTTP_201_CREATED)
+async def create_posts_bulk(posts: Annotated[list[PostCreate], Body(max_length=settings.POSTS_BULK_MAX)],
+                            db: AsyncSession = Depends(get_db), current_user: int = Depends(verify_access_token)):
+    """Creates up to POSTS_BULK_MAX posts in one INSERT ... RETURNING, all of them or none.
+    Every invalid item is reported with its index in `loc`, not just the first one."""
     if not posts:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post(s) Not Found")
-    return posts
+        return []
+
+    result = await db.execute(
+        insert(Post).returning(Post.id, Post.owner_id, Post.title, Post.content, Post.like_count, sort_by_parameter_order=True),
+        [{"title": p.title, "content": p.content, "owner_id": current_user.id} for p in posts],
+    )
+    rows = result.all()
+    await db.commit()
+    await response_cache.invalidate("posts")
+    await fan_out(db, current_user.id, [r.id for r in rows])
+
+    # every post belongs to the caller, the owner comes from the principal instead of another query
+    owner = UserResponse(username=current_user.username, full_name=current_user.full_name, email=current_user.email)
+    return [PostResponse(id=r.id, owner_id=r.owner_id, title=r.title, content=r.content, like_count=r.like_count, owner=owner) for r in rows]
+
+@router.get("/posts/my_posts", response_model=PostPage)
+async def get_posts(request: Request, limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1), cursor: str | None = None,
+                    include_liked: bool = False, db: AsyncSession = Depends(get_db), current_user: int = Depends(verify_access_token)):
+    liked_by = current_user.id if include_liked else None
+    etag = await page_etag(db, limit, cursor, Post.owner_id == current_user.id, liked_by=liked_by)
+    if response := not_modified(request, etag):
+        return response
 
-@router.get("/posts", response_model=list[PostResponse])
-def get_all_posts(db: Session = Depends(get_db), current_user: int = Depends(verify_access_token)):
-    posts = db.query(Post).all()
-    return posts
+    async def build():
+        page = await keyset_page(db, limit, cursor, Post.owner_id == current_user.id, liked_by=liked_by)
+        if not page.items and cursor is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post(s) Not Found")
+        return page
+
+    # the etag is in the key, so a body cached by a worker that missed an invalidation is never
+    # served under a newer etag
+    response = await response_cache.cached_json("posts", ("mine", current_user.id, limit, cursor, include_liked, etag), build)
+    response.headers.update(etag_headers(etag))
+    return response
+
+@router.get("/posts", response_model=PostPage)
+async def get_all_posts(request: Request, limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1), cursor: str | None = None,
+                        include_liked: bool = False, db: AsyncSession = Depends(get_db), current_user: int = Depends(verify_access_token)):
+    # the feed is the same for everybody, so it's cached once per page, not per user, unless
+    # it carries the caller's own liked_by_me flags
+    liked_by = current_user.id if include_liked else None
+    # polling clients send back the etag, an unchanged page costs one narrow query and no body
+    etag = await page_etag(db, limit, cursor, liked_by=liked_by)
+    if response := not_modified(request, etag):
+        return response
+
+    response = await response_cache.cached_json("posts", ("feed", limit, cursor, liked_by, etag), lambda: keyset_page(db, limit, cursor, liked_by=liked_by))
+    response.headers.update(etag_headers(etag))
+    return response
+
+@router.get("/posts/search", response_model=PostPage)
+async def search_posts(q: str = Query(..., min_length=1, max_length=200), limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1),
+                       cursor: str | None = None, db: AsyncSession = Depends(get_db), current_user: int = Depends(verify_access_token)):
+    """Posts matching q in their title or content, best match first."""
+    q = q.strip()
+    if not q:
+        # min_length lets "   " through, and an empty MATCH is a syntax error on sqlite
+        raise HTTPException(status_code=422, detail="Search query has no terms")
+    limit = clamp_limit(limit)
+    query, rank = search_query(q)
+    # same keyset idea as the feeds, on (rank, id) instead of (created_at, id)
+    if cursor:
+        after_rank, post_id = decode_rank_cursor(cursor)
+        query = query.where(tuple_(rank, Post.id) < (after_rank, post_id))
+    result = await db.execute(query.order_by(rank.desc(), Post.id.desc()).limit(limit + 1))
+    rows = result.all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_rank_cursor(rows[-1].rank, rows[-1].id)
+    return PostPage.model_construct(items=[post_from_row(row) for row in rows], next_cursor=next_cursor)
+
+@router.get("/posts/trending", response_model=PostPage)
+async def trending_posts(limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1), cursor: str | None = None,
+                         db: AsyncSession = Depends(get_db), current_user: int = Depends(verify_access_token)):
+    """Posts with the most recent likes first, older likes count for less. See app/trending.py."""
+    limit = clamp_limit(limit)
+    ranked = trending.page(limit + 1, decode_rank_cursor(cursor) if cursor else None)
+    next_cursor = None
+    if len(ranked) > limit:
+        ranked = ranked[:limit]
+        post_id, score = ranked[-1]
+        next_cursor = encode_rank_cursor(score, post_id)
+    items = await posts_by_ids(db, [post_id for post_id, _ in ranked])
+    return PostPage.model_construct(items=items, next_cursor=next_cursor)
+
+@router.get("/posts/timeline", response_model=PostPage)
+async def home_timeline(limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1), cursor: str | None = None,
+                        db: AsyncSession = Depends(get_db), current_user: int = Depends(verify_access_token)):
+    """Newest posts from the accounts the current user follows, and their own. See app/timeline.py."""
+    limit = clamp_limit(limit)
+    post_ids = await timeline_page(db, current_user.id, limit + 1, decode_id_cursor(cursor) if cursor else None)
+    next_cursor = None
+    if len(post_ids) > limit:
+        post_ids = post_ids[:limit]
+        next_cursor = encode_id_cursor(post_ids[-1])
+    return PostPage.model_construct(items=await posts_by_ids(db, post_ids), next_cursor=next_cursor)
+
+@router.get("/posts/export")
+async def export_posts(since: datetime | None = None, current_user: int = Depends(verify_access_token)):
+    """Every post as NDJSON, or only the ones updated since the given time for incremental exports.
+
+    Incremental exports leave like_count out: a like doesn't move updated_at (bump_like_count),
+    so the posts in them wouldn't carry the latest counts. Those come with a full export.
+    """
+    if since is None:
+        query = select(Post.id, Post.owner_id, Post.title, Post.content, Post.like_count, Post.created_at, Post.updated_at)
+    else:
+        query = select(Post.id, Post.owner_id, Post.title, Post.content, Post.created_at, Post.updated_at).where(Post.updated_at >= since)
+    return ndjson_response(query.order_by(Post.id))
 
 @router.put("/posts/{post_id}", response_model=PostResponse)
-def update_post(post_id: int, post: PostCreate, db: Session = Depends(get_db), current_user: int = Depends(verify_access_token)):
-    db_post = db.query(Post).filter(Post.id == post_id).first()
-    if not db_post:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+async def update_post(post_id: int, post: PostCreate, db: AsyncSession = Depends(get_db), current_user: int = Depends(verify_access_token)):
+    db_post = await get_post_or_404(db, post_id)
 
     if db_post.owner_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this post")
     db_post.title = post.title
     db_post.content = post.content
-    db.commit()
-    db.refresh(db_post)
+    await db.commit()
+    await response_cache.invalidate("posts")
+    await db.refresh(db_post)
     return db_post
 
 @router.delete("/posts/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_post(post_id: int, db: Session = Depends(get_db), current_user: int = Depends(verify_access_token)):
-    db_post = db.query(Post).filter(Post.id == post_id).first()
-    if not db_post:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+async def delete_post(post_id: int, db: AsyncSession = Depends(get_db), current_user: int = Depends(verify_access_token)):
+    db_post = await get_post_or_404(db, post_id)
 
     if db_post.owner_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this post")
     
-    db.delete(db_post)
-    db.commit()
-    return None
\ No newline at end of file
+    await db.delete(db_post)
+    await db.commit()
+    await response_cache.invalidate("posts")
+    return None
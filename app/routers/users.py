@@ -1,68 +1,167 @@
-from fastapi import FastAPI, Depends, HTTPException, status,APIRouter
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import FastAPI, Depends, HTTPException, status,APIRouter, Request
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from app.database import get_db, dialect_insert
 from app.schemas import UserCreate ,UserResponse
-from app.db_models import User
+from app.db_models import User, Follows, Post, Likes
 from app import Pass_Hash_Algo
+from app.response_cache import response_cache
+from app.etag import make_etag, not_modified, etag_headers
+from app.serialization import user_rows_query, user_from_row
+from app.export import ndjson_response
+from app.timeline import timelines
 
-from app.token import verify_access_token
+from app.token import verify_access_token, invalidate_principal
 
 router = APIRouter(
     prefix="/users",
     tags=["Users"]
 )
 
+async def get_user_or_404(db: AsyncSession, user_id: int) -> User:
+    result = await db.execute(select(User).where(User.id == user_id))
+    db_user = result.scalars().first()
+    if not db_user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return db_user
+
 @router.post("/", status_code=status.HTTP_201_CREATED ,response_model=UserResponse)
-def create_user(user: UserCreate , db: Session = Depends(get_db)):
+async def create_user(user: UserCreate , db: AsyncSession = Depends(get_db)):
 
-    db_user = db.query(User).filter((User.username == user.username) | (User.email == user.email)).first()
-    if db_user:
+    result = await db.execute(select(User).where((User.username == user.username) | (User.email == user.email)))
+    if result.scalars().first():
         raise HTTPException(status_code=400, detail="Username or email already registered")
 
-    user.hashed_password = Pass_Hash_Algo.get_password_hash(user.hashed_password)
+    user.hashed_password = await Pass_Hash_Algo.get_password_hash_async(user.hashed_password)
     new_user = User(**user.model_dump())
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await response_cache.invalidate("users")
+    await db.refresh(new_user)
     return new_user
 
 
 
 @router.get("/profile", response_model=UserResponse)
-def read_user(db: Session = Depends(get_db), GreenLight: User = Depends(verify_access_token)) -> UserResponse:
-    db_user = db.query(User).filter(User.id == GreenLight.id).first()
-    if not db_user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    return db_user
+async def read_user(request: Request, db: AsyncSession = Depends(get_db), GreenLight: User = Depends(verify_access_token)) -> UserResponse:
+    result = await db.execute(select(User.id, User.updated_at).where(User.id == GreenLight.id))
+    etag = make_etag(result.all())
+    if response := not_modified(request, etag):
+        return response
+
+    async def build():
+        return UserResponse.model_validate(await get_user_or_404(db, GreenLight.id))
+
+    response = await response_cache.cached_json("users", ("profile", GreenLight.id, etag), build)
+    response.headers.update(etag_headers(etag))
+    return response
+
+@router.get("/", response_model=list[UserResponse])
+async def read_users(db: AsyncSession = Depends(get_db), GreenLight: User = Depends(verify_access_token)):
+    # only the public columns, this used to hand out every user's hashed_password
+    async def build():
+        result = await db.execute(user_rows_query())
+        return [user_from_row(row) for row in result.all()]
+
+    return await response_cache.cached_json("users", ("list",), build)
+
 
-@router.get("/")
-def read_users(db: Session = Depends(get_db), GreenLight: User = Depends(verify_access_token)):
-    users = db.query(User).all()
-    return list(users)
+@router.get("/export")
+async def export_users(since: datetime | None = None, GreenLight: User = Depends(verify_access_token)):
+    """Every user as NDJSON (never the password hash), or only the ones updated since the given time."""
+    query = select(User.id, User.username, User.full_name, User.email, User.created_at, User.updated_at)
+    if since is not None:
+        query = query.where(User.updated_at >= since)
+    return ndjson_response(query.order_by(User.id))
 
 
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user(user_id: int, user: UserCreate, db: Session = Depends(get_db), GreenLight: User = Depends(verify_access_token)) -> UserResponse:
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if not db_user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+async def update_user(user_id: int, user: UserCreate, db: AsyncSession = Depends(get_db), GreenLight: User = Depends(verify_access_token)) -> UserResponse:
+    db_user = await get_user_or_404(db, user_id)
     db_user.username = user.username
     db_user.email = user.email
     db_user.full_name = user.full_name
 
-    user.hashed_password = Pass_Hash_Algo.get_password_hash(user.hashed_password)
+    user.hashed_password = await Pass_Hash_Algo.get_password_hash_async(user.hashed_password)
     db_user.hashed_password = user.hashed_password  # In a real app, hash the password!
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    invalidate_principal(user_id)
+    # posts embed their owner, so those pages are stale too
+    await response_cache.invalidate("users", "posts")
+    await db.refresh(db_user)
     return db_user
 
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(user_id: int, db: Session = Depends(get_db)) -> None:
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if not db_user:
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_db)) -> None:
+    db_user = await get_user_or_404(db, user_id)
+    # their likes go with them (ON DELETE CASCADE), the counters on the liked posts have to follow
+    await db.execute(
+        update(Post)
+        .where(Post.id.in_(select(Likes.post_id).where(Likes.user_id == user_id)))
+        .values(like_count=Post.like_count - 1, updated_at=Post.updated_at)
+    )
+    # same for their follows and the follower_count of everyone they followed
+    await db.execute(
+        update(User)
+        .where(User.id.in_(select(Follows.followee_id).where(Follows.follower_id == user_id)))
+        .values(follower_count=User.follower_count - 1, updated_at=User.updated_at)
+    )
+    await db.delete(db_user)
+    await db.commit()
+    invalidate_principal(user_id)
+    # posts embed their owner, so those pages are stale too
+    await response_cache.invalidate("users", "posts")
+    return None
+
+
+async def bump_follower_count(db: AsyncSession, user_id: int, delta: int) -> None:
+    # same as like_count: atomic, and following someone isn't an edit of their profile
+    await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(follower_count=User.follower_count + delta, updated_at=User.updated_at)
+    )
+
+
+@router.post("/{user_id}/follow", status_code=status.HTTP_201_CREATED)
+async def follow_user(user_id: int, db: AsyncSession = Depends(get_db), GreenLight: User = Depends(verify_access_token)):
+    if user_id == GreenLight.id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="You can't follow yourself")
+    try:
+        result = await db.execute(
+            dialect_insert(Follows)
+            .values(follower_id=GreenLight.id, followee_id=user_id)
+            .on_conflict_do_nothing()
+            .returning(Follows.followee_id)
+        )
+    except IntegrityError:
+        await db.rollback()
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    db.delete(db_user)
-    db.commit()
-    return None
\ No newline at end of file
+    if result.first() is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="You already follow this user")
+
+    await bump_follower_count(db, user_id, 1)
+    await db.commit()
+    # their older posts belong in the timeline now, it's rebuilt on the next read
+    await timelines.drop(GreenLight.id)
+    return {"message": "User followed successfully"}
+
+
+@router.delete("/{user_id}/follow", status_code=status.HTTP_204_NO_CONTENT)
+async def unfollow_user(user_id: int, db: AsyncSession = Depends(get_db), GreenLight: User = Depends(verify_access_token)) -> None:
+    result = await db.execute(
+        delete(Follows)
+        .where(Follows.follower_id == GreenLight.id, Follows.followee_id == user_id)
+        .returning(Follows.followee_id)
+    )
+    if result.first() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="You don't follow this user")
+
+    await bump_follower_count(db, user_id, -1)
+    await db.commit()
+    await timelines.drop(GreenLight.id)
+    return None
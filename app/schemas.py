@@ -28,12 +28,24 @@ class PostResponse(BaseModel):
     owner_id: int
     title: str
     content: str
+    like_count: int = 0
+    # only filled in when the listing was asked for it (?include_liked=true)
+    liked_by_me: bool | None = None
     owner: UserResponse
 
     class Config:
         from_attributes = True
 
+class PostPage(BaseModel):
+    items: list[PostResponse]
+    # pass this back as ?cursor= to get the next page, None means you reached the end
+    next_cursor: str | None = None
+
 class Like(BaseModel):
     post_id: int
     # dir ensures the direction is either 0 or 1
     dir: Annotated[int,Field(ge=0, le=1)]
+
+class LikeStatus(BaseModel):
+    # post id -> whether the current user liked it, for every id that was asked about
+    liked: dict[int, bool]
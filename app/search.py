@@ -0,0 +1,54 @@
+from sqlalchemy import column, func, table, text
+from .database import IS_SQLITE, engine
+from .db_models import Post
+from .serialization import post_rows_query
+
+# Full-text search over post title + content.
+#   postgres: posts.search_vector, a generated tsvector column with a GIN index (see db_models)
+#   sqlite:   an FTS5 table kept in step with posts by triggers, so search works without postgres
+# Either way search_query() hands back a post_rows_query with a `rank` column, higher is better.
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(title, content, content='posts', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    # only on edits of the text, a like bumping like_count shouldn't reindex the post
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE OF title, content ON posts BEGIN
+        INSERT INTO posts_fts(posts_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO posts_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+]
+
+posts_fts = table("posts_fts", column("rowid"), column("rank"))
+
+
+async def create_sqlite_fts() -> None:
+    """Creates the FTS5 table and its triggers on the sqlite stand-in."""
+    async with engine.begin() as conn:
+        for ddl in SQLITE_FTS_DDL:
+            await conn.execute(text(ddl))
+
+
+def _fts5_query(q: str) -> str:
+    # every word as a quoted phrase: user input can't trip over FTS5's own query syntax
+    return " ".join('"' + word.replace('"', '""') + '"' for word in q.split())
+
+
+def search_query(q: str):
+    """(select of matching post rows with a rank column, the rank expression to order/seek on)."""
+    if IS_SQLITE:
+        # fts5's rank is bm25, where lower is better
+        rank = -posts_fts.c.rank
+        query = (
+            post_rows_query(text("posts_fts MATCH :fts_query").bindparams(fts_query=_fts5_query(q)))
+            .join(posts_fts, posts_fts.c.rowid == Post.id)
+        )
+    else:
+        tsquery = func.websearch_to_tsquery("english", q)
+        rank = func.ts_rank_cd(Post.search_vector, tsquery)
+        query = post_rows_query(Post.search_vector.op("@@")(tsquery))
+    return query.add_columns(rank.label("rank")), rank
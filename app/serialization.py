@@ -0,0 +1,48 @@
+from sqlalchemy import exists, select
+from .config import settings
+from .db_models import Likes, Post, User
+from .schemas import PostResponse, UserResponse
+
+# The list endpoints select just the columns their response schema needs, as plain row tuples:
+# no full entities, no identity map, and no hashed_password riding along in memory.
+# With FAST_SERIALIZATION the models are also built with model_construct, the rows come
+# straight out of our own schema so re-validating every field of every row buys nothing.
+
+POST_ROW_COLUMNS = (
+    Post.id, Post.owner_id, Post.title, Post.content, Post.like_count, Post.created_at,
+    User.username, User.full_name, User.email,
+)
+USER_ROW_COLUMNS = (User.username, User.full_name, User.email)
+
+
+def post_rows_query(*where, liked_by: int | None = None):
+    """Post + owner columns as one flat row, ready for keyset pagination.
+
+    With liked_by, every row also says whether that user liked the post, an EXISTS probe on the
+    likes primary key inside the same query.
+    """
+    columns = list(POST_ROW_COLUMNS)
+    if liked_by is not None:
+        columns.append(exists().where(Likes.post_id == Post.id, Likes.user_id == liked_by).label("liked_by_me"))
+    return select(*columns).join(User, User.id == Post.owner_id).where(*where)
+
+
+def user_rows_query(*where):
+    return select(*USER_ROW_COLUMNS).where(*where)
+
+
+def post_from_row(row) -> PostResponse:
+    """PostResponse from a post_rows_query row."""
+    owner = {"username": row.username, "full_name": row.full_name, "email": row.email}
+    fields = {"id": row.id, "owner_id": row.owner_id, "title": row.title, "content": row.content, "like_count": row.like_count,
+              "liked_by_me": row._mapping.get("liked_by_me")}
+    if settings.FAST_SERIALIZATION:
+        return PostResponse.model_construct(**fields, owner=UserResponse.model_construct(**owner))
+    return PostResponse.model_validate({**fields, "owner": owner})
+
+
+def user_from_row(row) -> UserResponse:
+    """UserResponse from a user_rows_query row."""
+    if settings.FAST_SERIALIZATION:
+        return UserResponse.model_construct(**row._mapping)
+    return UserResponse.model_validate(dict(row._mapping))
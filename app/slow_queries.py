@@ -0,0 +1,191 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from greenlet import getcurrent
+from sqlalchemy import event
+from .config import settings
+from .instrumentation import current_request
+
+logger = logging.getLogger(__name__)
+
+# Opt-in (SLOW_QUERY_LOG): every statement slower than SLOW_QUERY_MS is logged with the shape of
+# its parameters (types, never values), the route and the line of our code that ran it, and
+# folded into per-fingerprint totals served at GET /metrics/slow_queries. A sample of the slow
+# SELECTs also gets an EXPLAIN (ANALYZE, BUFFERS) on a connection of its own.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# frames in here are the instrumentation itself, not the code that ran the query
+SKIP_FILES = {os.path.join(APP_DIR, name) for name in ("slow_queries.py", "instrumentation.py", "database.py")}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w$.])-?\d+(?:\.\d+)?\b")
+# $1 (asyncpg), %(name)s, :name and ?, with any ::TYPE cast the compiler stuck on the end
+_PLACEHOLDER = re.compile(r"(?:\$\d+|%\(\w+\)s|(?<![:\w]):\w+|\?)(?:::\w+(?:\[\])?)?")
+_IN_LIST = re.compile(r"\bIN \((?:\?, )*\?\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"VALUES (\(\?(?:, \?)*\))(?:, \(\?(?:, \?)*\))+", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    """The statement with every literal and bind parameter as ?, and lists of them collapsed, so
+    the same query with other values (or another number of them) looks the same."""
+    text = _SPACE.sub(" ", statement).strip()
+    text = _STRING.sub("?", text)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _IN_LIST.sub("IN (...)", text)
+    return _VALUES_LIST.sub(r"VALUES \1, ...", text)
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest()
+
+
+def parameter_shape(parameters, executemany: bool) -> str:
+    """Types of the bound parameters, the values can be anybody's email or password hash."""
+    def shape(params):
+        if isinstance(params, dict):
+            return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in params.items()) + "}"
+        if isinstance(params, (list, tuple)):
+            return "(" + ", ".join(type(value).__name__ for value in params) + ")"
+        return type(params).__name__
+
+    if executemany and parameters:
+        return f"{len(parameters)} x {shape(parameters[0])}"
+    return shape(parameters)
+
+
+def caller() -> str:
+    """file:line in function of the first frame of our own code that led to the statement."""
+    frame = sys._getframe(1)
+    glet = getcurrent()
+    while frame is not None or glet is not None:
+        while frame is not None:
+            filename = frame.f_code.co_filename
+            if filename.startswith(APP_DIR) and filename not in SKIP_FILES:
+                return f"{os.path.relpath(filename, os.path.dirname(APP_DIR))}:{frame.f_lineno} in {frame.f_code.co_name}"
+            frame = frame.f_back
+        # sqlalchemy's async layer runs the statement in a child greenlet, the code that awaited
+        # it is suspended in the parent one
+        glet = glet.parent if glet is not None else None
+        frame = glet.gr_frame if glet is not None else None
+    return "unknown"
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float, explain_sample: float, max_fingerprints: int):
+        self.threshold = threshold_ms / 1000
+        self.explain_sample = explain_sample
+        self.max_fingerprints = max_fingerprints
+        # fingerprint -> totals, see _record
+        self._queries: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._explaining = False
+        self.dropped = 0
+        self.engine = None
+
+    def install(self, engine) -> None:
+        self.engine = engine
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["slow_query_start"].pop()
+        if elapsed < self.threshold or (context is not None and context.execution_options.get("explaining")):
+            return
+        stats = current_request.get()
+        route = stats.route if stats is not None else "-"
+        where = caller()
+        shape = parameter_shape(parameters, executemany)
+        normalized = normalize(statement)
+        key = fingerprint(normalized)
+        logger.warning("slow query %.1fms [%s] route=%s caller=%s params=%s: %s",
+                       elapsed * 1000, key, route, where, shape, normalized)
+        self._record(key, normalized, elapsed, route, where, shape)
+
+        # ANALYZE runs the statement for real, so only plain SELECTs, and one at a time: they run
+        # the query again and we don't want to pile onto a database that's already slow
+        is_select = normalized.lstrip("( ").upper().startswith("SELECT")
+        if is_select and not executemany and not self._explaining and random.random() < self.explain_sample:
+            self._explaining = True
+            asyncio.get_running_loop().create_task(self._explain(key, statement, parameters))
+
+    def _record(self, key, normalized, elapsed, route, where, shape) -> None:
+        with self._lock:
+            entry = self._queries.get(key)
+            if entry is None:
+                if len(self._queries) >= self.max_fingerprints:
+                    self.dropped += 1
+                    return
+                entry = self._queries[key] = {
+                    "statement": normalized, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "routes": Counter(), "callers": Counter(), "params": shape, "explain": None,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += elapsed * 1000
+            entry["max_ms"] = max(entry["max_ms"], elapsed * 1000)
+            entry["routes"][route] += 1
+            entry["callers"][where] += 1
+
+    async def _explain(self, key: str, statement: str, parameters) -> None:
+        if self.engine.dialect.name == "postgresql":
+            prefix = "EXPLAIN (ANALYZE, BUFFERS) "
+        else:
+            # sqlite only has the plan, not what running it cost
+            prefix = "EXPLAIN QUERY PLAN "
+        try:
+            async with self.engine.connect() as conn:
+                conn = await conn.execution_options(explaining=True)
+                result = await conn.exec_driver_sql(prefix + statement, parameters)
+                plan = "\n".join(" ".join(str(col) for col in row) for row in result)
+                # a custom plan prints the bound values, e.g. Index Cond: (email = '...')
+                plan = _STRING.sub("'?'", plan)
+                await conn.rollback()
+            with self._lock:
+                if key in self._queries:
+                    self._queries[key]["explain"] = plan
+        except Exception:
+            logger.exception("EXPLAIN of a slow query failed")
+        finally:
+            self._explaining = False
+
+    def report(self, limit: int = 50) -> dict:
+        """The fingerprints that cost the most in total, worst first."""
+        with self._lock:
+            entries = sorted(self._queries.items(), key=lambda item: item[1]["total_ms"], reverse=True)[:limit]
+            queries = [
+                {
+                    "fingerprint": key,
+                    **{name: entry[name] for name in ("statement", "count", "params", "explain")},
+                    "total_ms": round(entry["total_ms"], 2),
+                    "avg_ms": round(entry["total_ms"] / entry["count"], 2),
+                    "max_ms": round(entry["max_ms"], 2),
+                    "routes": dict(entry["routes"].most_common(5)),
+                    "callers": dict(entry["callers"].most_common(5)),
+                }
+                for key, entry in entries
+            ]
+        return {
+            "enabled": settings.SLOW_QUERY_LOG,
+            "threshold_ms": self.threshold * 1000,
+            "fingerprints": len(self._queries),
+            "dropped": self.dropped,
+            "queries": queries,
+        }
+
+
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.SLOW_QUERY_MS,
+    explain_sample=settings.SLOW_QUERY_EXPLAIN_SAMPLE,
+    max_fingerprints=settings.SLOW_QUERY_MAX_FINGERPRINTS,
+)
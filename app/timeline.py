@@ -0,0 +1,158 @@
+import bisect
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .cache import TTLCache
+from .config import settings
+from .db_models import Follows, Post, User
+
+# Home timelines: the newest TIMELINE_SIZE post ids from everyone a user follows (and their own).
+# They're written when a post is made (fan-out-on-write), so reading a page is one range lookup
+# in the user's own list, however many accounts they follow.
+#
+# Accounts with TIMELINE_FANOUT_MAX_FOLLOWERS followers or more aren't pushed anywhere, one post
+# would mean that many writes. Their posts are merged in when a timeline is read instead
+# (fan-out-on-read): one query on the posts (owner_id, ...) index for the page.
+#
+# A timeline nobody read lately isn't kept, it's built from the database on the next read.
+# Pages past the end of a full timeline come straight from the database as well.
+
+
+class MemoryTimelines:
+    """Per worker: a post only reaches the timelines cached in the worker that took it, the
+    others see it once theirs expire. Use the redis store when running more than one worker."""
+
+    def __init__(self, size: int, max_users: int, ttl: float):
+        self.size = size
+        # user_id -> post ids, oldest first so a new post is an append
+        self._timelines = TTLCache(max_size=max_users, ttl=ttl)
+
+    async def page(self, user_id: int, before: int | None, limit: int) -> tuple[list[int], bool] | None:
+        """(up to limit ids older than before, newest first; whether the timeline is full), None if not cached."""
+        timeline = self._timelines.get(user_id)
+        if timeline is None:
+            return None
+        end = len(timeline) if before is None else bisect.bisect_left(timeline, before)
+        return timeline[max(0, end - limit):end][::-1], len(timeline) >= self.size
+
+    async def set(self, user_id: int, post_ids: list[int]) -> None:
+        self._timelines.set(user_id, sorted(post_ids)[-self.size:])
+
+    async def push(self, user_ids: list[int], post_id: int) -> None:
+        for user_id in user_ids:
+            # not cached means it'll be built from the database, this post included
+            timeline = self._timelines.get(user_id)
+            if timeline is not None:
+                bisect.insort(timeline, post_id)
+                del timeline[:-self.size]
+
+    async def drop(self, user_id: int) -> None:
+        self._timelines.pop(user_id)
+
+
+class RedisTimelines:
+    """A sorted set of post ids per user, shared by all workers. Needs `pip install redis`."""
+
+    # an empty timeline has to exist too, so every set holds this member below any real post id
+    MARKER = 0
+    # add to timelines that are cached only, and keep the marker plus the newest `size` ids
+    PUSH = """
+        if redis.call('exists', KEYS[1]) == 1 then
+            redis.call('zadd', KEYS[1], ARGV[1], ARGV[1])
+            redis.call('zremrangebyrank', KEYS[1], 1, -1 - tonumber(ARGV[2]))
+        end
+    """
+
+    def __init__(self, url: str, size: int, ttl: float):
+        from redis import asyncio as aioredis
+        self._redis = aioredis.from_url(url)
+        self._push = self._redis.register_script(self.PUSH)
+        self.size = size
+        self.ttl = ttl
+
+    def _key(self, user_id: int) -> str:
+        return f"timeline:{user_id}"
+
+    async def page(self, user_id: int, before: int | None, limit: int) -> tuple[list[int], bool] | None:
+        key = self._key(user_id)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.zrevrangebyscore(key, "+inf" if before is None else f"({before}", f"({self.MARKER}", start=0, num=limit)
+            pipe.zcard(key)
+            items, count = await pipe.execute()
+        if not count:
+            return None
+        return [int(item) for item in items], count - 1 >= self.size
+
+    async def set(self, user_id: int, post_ids: list[int]) -> None:
+        key = self._key(user_id)
+        members = {self.MARKER: self.MARKER, **{post_id: post_id for post_id in sorted(post_ids)[-self.size:]}}
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.zadd(key, members)
+            pipe.pexpire(key, int(self.ttl * 1000))
+            await pipe.execute()
+
+    async def push(self, user_ids: list[int], post_id: int) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                await self._push(keys=[self._key(user_id)], args=[post_id, self.size], client=pipe)
+            await pipe.execute()
+
+    async def drop(self, user_id: int) -> None:
+        await self._redis.delete(self._key(user_id))
+
+
+def build_store():
+    if settings.TIMELINE_BACKEND == "redis":
+        return RedisTimelines(settings.REDIS_URL, size=settings.TIMELINE_SIZE, ttl=settings.TIMELINE_TTL_SECONDS)
+    return MemoryTimelines(size=settings.TIMELINE_SIZE, max_users=settings.TIMELINE_MAX_USERS, ttl=settings.TIMELINE_TTL_SECONDS)
+
+timelines = build_store()
+
+
+def _followed(user_id: int, celebrities: bool | None = None):
+    query = select(Follows.followee_id).where(Follows.follower_id == user_id)
+    if celebrities is None:
+        return query
+    is_celebrity = User.follower_count >= settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+    return query.join(User, User.id == Follows.followee_id).where(is_celebrity if celebrities else ~is_celebrity)
+
+
+async def _newest(db: AsyncSession, owners, before: int | None, limit: int) -> list[int]:
+    query = select(Post.id).where(owners)
+    if before is not None:
+        query = query.where(Post.id < before)
+    result = await db.execute(query.order_by(Post.id.desc()).limit(limit))
+    return list(result.scalars().all())
+
+
+async def fan_out(db: AsyncSession, author_id: int, post_ids: list[int]) -> None:
+    """Pushes freshly committed posts onto the author's timeline and their followers'."""
+    result = await db.execute(select(User.follower_count).where(User.id == author_id))
+    if (result.scalar() or 0) >= settings.TIMELINE_FANOUT_MAX_FOLLOWERS:
+        # the followers' reads merge these in, only the author's own timeline gets them
+        user_ids = [author_id]
+    else:
+        result = await db.execute(select(Follows.follower_id).where(Follows.followee_id == author_id))
+        user_ids = [author_id, *result.scalars().all()]
+    for post_id in post_ids:
+        await timelines.push(user_ids, post_id)
+
+
+async def timeline_page(db: AsyncSession, user_id: int, limit: int, before: int | None) -> list[int]:
+    """Up to `limit` post ids of the user's home timeline older than `before`, newest first."""
+    cached = await timelines.page(user_id, before, limit)
+    if cached is None:
+        # everything fan-out-on-write would have pushed here, the celebrities are merged below
+        owners = or_(Post.owner_id == user_id, Post.owner_id.in_(_followed(user_id, celebrities=False)))
+        await timelines.set(user_id, await _newest(db, owners, None, settings.TIMELINE_SIZE))
+        cached = await timelines.page(user_id, before, limit)
+    page, full = cached
+
+    if len(page) < limit and full:
+        # past the end of what's kept, older posts come from the database
+        owners = or_(Post.owner_id == user_id, Post.owner_id.in_(_followed(user_id)))
+        return await _newest(db, owners, before, limit)
+
+    merged = await _newest(db, Post.owner_id.in_(_followed(user_id, celebrities=True)), before, limit)
+    # a post is in both if its author became a celebrity after it was pushed
+    return sorted(set(page) | set(merged), reverse=True)[:limit]
@@ -1,11 +1,17 @@
 import jwt
+import hashlib
+import time
+from dataclasses import dataclass
 from jwt.exceptions import InvalidTokenError
 from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
 from app.db_models import User
+from app.cache import TTLCache
+from app.instrumentation import phase
 from .config import settings
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -20,6 +26,26 @@ ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
     # signature = header + payload + secret_key using algorithm
     # token = header + payload + signature
 
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """The authenticated user as the routers see it, a plain snapshot not tied to any session."""
+    id: int
+    username: str
+    email: str
+    full_name: str | None
+    is_superuser: bool = False
+
+# user id -> Principal, so most authenticated requests don't touch the users table at all
+principal_cache = TTLCache(max_size=settings.AUTH_CACHE_MAX_SIZE, ttl=settings.AUTH_CACHE_TTL_SECONDS)
+
+# sha256(token) -> decoded claims, repeat tokens skip the signature check (expensive with RS256/ES256)
+token_cache = TTLCache(max_size=settings.TOKEN_CACHE_MAX_SIZE, ttl=settings.TOKEN_CACHE_TTL_SECONDS)
+
+def invalidate_principal(user_id: int) -> None:
+    """Call after changing or deleting a user so this worker stops serving the old copy."""
+    principal_cache.pop(user_id)
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None)-> str:
     payload = data.copy()
     if expires_delta:
@@ -32,23 +58,56 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None)-> st
     return Token
 
 
-def verify_access_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> int:
+def decode_access_token(token: str) -> dict:
+    """jwt.decode, except a token we already verified is a dict lookup until it expires."""
+    # only the digest is kept, we don't want a pile of live bearer tokens sitting in memory
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(digest)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        ttl = settings.TOKEN_CACHE_TTL_SECONDS
+        if "exp" in payload:
+            ttl = min(ttl, payload["exp"] - time.time())
+        if ttl > 0:
+            token_cache.set(digest, payload, ttl=ttl)
+    return payload
+
+
+async def verify_access_token(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        userid : int = payload.get("sub")
-        if userid is None:
+    with phase("auth"):
+        try:
+            payload = decode_access_token(token)
+            sub = payload.get("sub")
+            if sub is None:
+                raise credentials_exception
+            # sub is the id as a string, asyncpg won't compare "98512" to an integer column for us
+            userid : int = int(sub)
+
+        except (InvalidTokenError, ValueError, TypeError):
             raise credentials_exception
-        
-    except InvalidTokenError:
-        raise credentials_exception
-    
-    UserData= db.query(User).filter(User.id == userid).first()
+
+        principal = principal_cache.get(userid)
+    if principal is not None:
+        return principal
+
+    result = await db.execute(select(User).where(User.id == userid))
+    UserData = result.scalars().first()
     if UserData is None:
         raise credentials_exception
-    
-    return UserData
\ No newline at end of file
+
+    principal = Principal(id=UserData.id, username=UserData.username, email=UserData.email, full_name=UserData.full_name,
+                          is_superuser=UserData.is_superuser)
+    principal_cache.set(userid, principal)
+    return principal
+
+
+async def require_superuser(principal: Principal = Depends(verify_access_token)) -> Principal:
+    """verify_access_token, and the user has to be flagged is_superuser."""
+    if not principal.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Superuser only")
+    return principal
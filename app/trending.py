@@ -0,0 +1,139 @@
+import asyncio
+import bisect
+import heapq
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import Integer, cast, func, select
+from .config import settings
+from .database import IS_SQLITE, SessionLocal
+from .db_models import Likes
+
+logger = logging.getLogger(__name__)
+
+# likes are counted per time bucket, not one by one: a bucket is this fraction of a half-life,
+# so a like's weight is off by at most 2 ** (1/16), about 4%, and the refresh query stays small
+BUCKETS_PER_HALF_LIFE = 16
+
+
+class TrendingRanking:
+    """In-memory ranking of posts by recent likes, best first, for GET /posts/trending.
+
+    Every like weighs 2 ** (age / half_life) less as it gets older and stops counting after
+    `window` seconds. Instead of decaying every score as the clock moves, each like adds
+    2 ** (liked_at / half_life) to its post (forward decay): old likes count for exponentially
+    less and the order never has to be recomputed just because time passed. Scores are kept as
+    log2 of that sum so they never overflow.
+
+    The ranking is rebuilt from the likes table every `refresh_interval` seconds, which bounds
+    how stale it can get and keeps workers in step with each other. In between, likes made
+    through this worker are folded in as they happen. Unlikes only show up at the next rebuild.
+    """
+
+    def __init__(self, half_life: float, window: float, refresh_interval: float, max_posts: int):
+        self.half_life = half_life
+        self.window = window
+        self.refresh_interval = refresh_interval
+        self.max_posts = max_posts
+        # post_id -> log2 score, and the same as (-score, -post_id) sorted best first
+        self._scores: dict[int, float] = {}
+        self._ranking: list[tuple[float, int]] = []
+        self._task: asyncio.Task | None = None
+        self.refreshes = 0
+        self.refreshed_at: float | None = None
+        self.refresh_ms = 0.0
+        self.incremental = 0
+
+    def _key(self, at: float) -> float:
+        return at / self.half_life
+
+    def record_like(self, post_id: int, at: float | None = None) -> None:
+        key = self._key(time.time() if at is None else at)
+        old = self._scores.get(post_id)
+        if old is not None:
+            del self._ranking[bisect.bisect_left(self._ranking, (-old, -post_id))]
+            # log2(2 ** old + 2 ** key) without leaving log space
+            high, low = max(old, key), min(old, key)
+            key = high + math.log2(1 + 2 ** (low - high))
+        self._scores[post_id] = key
+        bisect.insort(self._ranking, (-key, -post_id))
+        self.incremental += 1
+
+    def page(self, limit: int, after: tuple[float, int] | None = None) -> list[tuple[int, float]]:
+        """(post_id, score) for up to `limit` posts, starting after the (score, post_id) cursor."""
+        start = bisect.bisect_right(self._ranking, (-after[0], -after[1])) if after else 0
+        return [(-post_id, -score) for score, post_id in self._ranking[start:start + limit]]
+
+    def current_score(self, score: float) -> float:
+        """A stored score as the decayed number of likes it's worth right now."""
+        return 2 ** (score - self._key(time.time()))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("refreshing the trending ranking failed")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def refresh(self) -> None:
+        started = time.perf_counter()
+        bucket = max(1, int(self.half_life / BUCKETS_PER_HALF_LIFE))
+        since = datetime.now(timezone.utc) - timedelta(seconds=self.window)
+        if IS_SQLITE:
+            epoch = cast(func.strftime("%s", Likes.created_at), Integer)
+        else:
+            epoch = func.extract("epoch", Likes.created_at)
+        bucket_no = func.floor(epoch / bucket)
+        query = (
+            select(Likes.post_id, bucket_no.label("bucket"), func.count().label("n"))
+            .where(Likes.created_at >= since)
+            .group_by(Likes.post_id, bucket_no)
+        )
+        async with SessionLocal() as db:
+            result = await db.execute(query)
+            buckets: dict[int, list[tuple[float, int]]] = {}
+            for post_id, bucket_index, n in result:
+                # a bucket's likes all count as made halfway through it
+                buckets.setdefault(post_id, []).append((self._key((int(bucket_index) + 0.5) * bucket), n))
+
+        scores = {}
+        for post_id, entries in buckets.items():
+            top = max(key for key, _ in entries)
+            scores[post_id] = top + math.log2(sum(n * 2 ** (key - top) for key, n in entries))
+        best = heapq.nlargest(self.max_posts, scores.items(), key=lambda item: (item[1], item[0]))
+        self._scores = dict(best)
+        self._ranking = sorted((-score, -post_id) for post_id, score in best)
+        self.refreshes += 1
+        self.refreshed_at = time.time()
+        self.refresh_ms = (time.perf_counter() - started) * 1000
+
+    def stats(self) -> dict:
+        return {
+            "posts": len(self._ranking),
+            "refreshes": self.refreshes,
+            "last_refresh_age_s": round(time.time() - self.refreshed_at, 1) if self.refreshed_at else None,
+            "last_refresh_ms": round(self.refresh_ms, 2),
+            "incremental_updates": self.incremental,
+        }
+
+
+trending = TrendingRanking(
+    half_life=settings.TRENDING_HALF_LIFE_HOURS * 3600,
+    window=settings.TRENDING_WINDOW_HOURS * 3600,
+    refresh_interval=settings.TRENDING_REFRESH_SECONDS,
+    max_posts=settings.TRENDING_MAX_POSTS,
+)
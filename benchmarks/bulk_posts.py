@@ -0,0 +1,78 @@
+"""Posts created per second: POST /posts one at a time against POST /posts/bulk.
+
+    DB_DRIVER=aiosqlite DB_NAME=bench.db python -m benchmarks.bulk_posts --posts 2000 --batch 200
+
+Runs the real app in-process (httpx against the ASGI app), so each request pays routing,
+auth, validation and its commit exactly like it would behind uvicorn, minus the network.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from app.main import app
+from app.token import create_access_token
+from benchmarks.seed import seed
+
+
+async def single(client, headers, posts, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(n):
+        async with semaphore:
+            r = await client.post("/posts", json={"title": f"single {n}", "content": "benchmark"}, headers=headers)
+            r.raise_for_status()
+
+    await asyncio.gather(*[one(n) for n in range(posts)])
+
+
+async def bulk(client, headers, posts, batch, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(start):
+        async with semaphore:
+            items = [{"title": f"bulk {n}", "content": "benchmark"} for n in range(start, min(start + batch, posts))]
+            r = await client.post("/posts/bulk", json=items, headers=headers)
+            r.raise_for_status()
+
+    await asyncio.gather(*[one(start) for start in range(0, posts, batch)])
+
+
+async def run(args):
+    async with app.router.lifespan_context(app):
+        ids = await seed(users=1, posts=0, likes=0)
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': str(ids['user_ids'][0])})}"}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            results = []
+            for name, fn in [("single", lambda: single(client, headers, args.posts, args.concurrency)),
+                             (f"bulk x{args.batch}", lambda: bulk(client, headers, args.posts, args.batch, args.concurrency))]:
+                start = time.perf_counter()
+                await fn()
+                elapsed = time.perf_counter() - start
+                results.append({"endpoint": name, "posts": args.posts, "seconds": round(elapsed, 3),
+                                "posts_per_second": round(args.posts / elapsed, 1)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{'endpoint':>12} {'posts/s':>10} {'seconds':>10}")
+    for r in results:
+        print(f"{r['endpoint']:>12} {r['posts_per_second']:>10} {r['seconds']:>10}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
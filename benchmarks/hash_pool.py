@@ -0,0 +1,47 @@
+"""Login throughput (argon2 verifications per second) against the hashing pool size.
+
+    python -m benchmarks.hash_pool --sizes 1 2 4 8 --logins 200
+
+Every /login pays exactly one verify_password, so this is the ceiling on logins/s
+for one worker with HASH_POOL_SIZE set to each of the sizes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app import Pass_Hash_Algo
+
+
+async def run(pool_size: int, logins: int, stored_hash: str) -> dict:
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=pool_size) as executor:
+        # warm the workers up so process start up isn't part of the number
+        await asyncio.gather(*[loop.run_in_executor(executor, Pass_Hash_Algo.verify_password, "warmup-pass", stored_hash) for _ in range(pool_size)])
+        start = time.perf_counter()
+        await asyncio.gather(*[loop.run_in_executor(executor, Pass_Hash_Algo.verify_password, "correct-horse", stored_hash) for _ in range(logins)])
+        elapsed = time.perf_counter() - start
+    return {"pool_size": pool_size, "logins": logins, "seconds": round(elapsed, 3), "logins_per_second": round(logins / elapsed, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    stored_hash = Pass_Hash_Algo.get_password_hash("correct-horse")
+    results = [asyncio.run(run(size, args.logins, stored_hash)) for size in sorted(set(args.sizes))]
+    print(f"{'pool size':>10} {'logins/s':>10} {'seconds':>10}")
+    for r in results:
+        print(f"{r['pool_size']:>10} {r['logins_per_second']:>10} {r['seconds']:>10}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""User id generation: a million snowflake ids, checked for collisions, and how the old scheme did.
+
+    DB_DRIVER=aiosqlite DB_NAME=bench.db python -m benchmarks.ids --count 1000000 --threads 8 --insert
+
+Ids are generated from several threads at once, the way the threadpool and the event loop share
+one generator. --insert also writes that many users through the ORM default, so the primary
+key gets the final say. Exits non-zero on any duplicate or out-of-order id.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+
+from sqlalchemy import func, insert, select
+
+from app import database
+from app.db_models import User
+from app.ids import new_id
+
+BATCH = 5000
+
+
+def generate(count: int, threads: int) -> tuple[list[list[int]], float]:
+    per_thread = [[] for _ in range(threads)]
+
+    def work(out, n):
+        for _ in range(n):
+            out.append(new_id())
+
+    workers = [threading.Thread(target=work, args=(out, count // threads + (i < count % threads)))
+               for i, out in enumerate(per_thread)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return per_thread, time.perf_counter() - start
+
+
+def first_random_collision(limit: int) -> int | None:
+    # what generate_user_id used to do, rows until the first retry
+    rng = random.Random(1)
+    seen = set()
+    for n in range(limit):
+        user_id = rng.randint(100, 99999)
+        if user_id in seen:
+            return n + 1
+        seen.add(user_id)
+    return None
+
+
+async def insert_users(count: int) -> dict:
+    if database.IS_SQLITE:
+        await database.create_all()
+    run = time.time_ns()
+    start = time.perf_counter()
+    async with database.SessionLocal() as db:
+        before = (await db.execute(select(func.count()).select_from(User))).scalar()
+        for offset in range(0, count, BATCH):
+            rows = [{"username": f"ids{run}-{offset + n}", "email": f"ids{run}-{offset + n}@example.com",
+                     "hashed_password": "x", "full_name": "Id Bench"} for n in range(min(BATCH, count - offset))]
+            await db.execute(insert(User), rows)
+        await db.commit()
+        after = (await db.execute(select(func.count(func.distinct(User.id))).select_from(User))).scalar()
+    await database.engine.dispose()
+    return {"inserted": after - before, "seconds": round(time.perf_counter() - start, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1_000_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--insert", action="store_true", help="also insert --count users into the database")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    per_thread, elapsed = generate(args.count, args.threads)
+    ids = [user_id for out in per_thread for user_id in out]
+    results = {
+        "generated": len(ids),
+        "unique": len(set(ids)),
+        "ordered_per_thread": all(out == sorted(out) for out in per_thread),
+        "ids_per_second": round(len(ids) / elapsed),
+        "max_id_bits": max(ids).bit_length(),
+        "random_first_collision_at": first_random_collision(args.count),
+    }
+    if args.insert:
+        results["insert"] = asyncio.run(insert_users(args.count))
+
+    for key, value in results.items():
+        print(f"{key:>26}: {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    ok = results["unique"] == results["generated"] and results["ordered_per_thread"]
+    if args.insert:
+        ok = ok and results["insert"]["inserted"] == args.count
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
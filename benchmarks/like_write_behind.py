@@ -0,0 +1,99 @@
+"""Commits per second for /like: the per-request path against the write-behind buffer.
+
+    DB_DRIVER=aiosqlite DB_NAME=bench.db python -m benchmarks.like_write_behind --events 5000
+
+Run it with LIKE_WRITE_BEHIND off so the first run takes the per-request path.
+Both runs replay the same like/unlike stream against a few hot posts, which is what a
+viral post looks like. Use a throwaway database, the runs really write.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from fastapi import HTTPException
+
+from app import database
+from app.like_buffer import LikeBuffer
+from app.routers.like import like_post
+from app.schemas import Like
+from app.token import Principal
+from benchmarks.seed import seed
+
+
+def make_events(user_ids, post_ids, count, hot_posts):
+    rng = random.Random(7)
+    hot = post_ids[:hot_posts]
+    return [(rng.choice(hot), rng.choice(user_ids), rng.choice((1, 1, 1, 0))) for _ in range(count)]
+
+
+async def per_request(events, concurrency):
+    """One session, one INSERT/DELETE and one commit per call, like the endpoint does today."""
+    semaphore = asyncio.Semaphore(concurrency)
+    commits = 0
+
+    async def one(post_id, user_id, dir):
+        nonlocal commits
+        async with semaphore, database.SessionLocal() as db:
+            user = Principal(id=user_id, username="", email="", full_name=None)
+            try:
+                await like_post(Like(post_id=post_id, dir=dir), db=db, current_user=user)
+                commits += 1
+            except HTTPException:
+                pass  # 409/404, the same as a client would get
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(*e) for e in events])
+    return time.perf_counter() - start, commits
+
+
+async def write_behind(events, flush_interval_ms, max_events):
+    buffer = LikeBuffer(flush_interval=flush_interval_ms / 1000, max_events=max_events)
+    buffer.start()
+    start = time.perf_counter()
+    for i, event in enumerate(events):
+        buffer.add(*event)
+        # give the flusher a chance to run like it would between requests
+        if i % 100 == 0:
+            await asyncio.sleep(0)
+    await buffer.close()
+    return time.perf_counter() - start, buffer.flushes
+
+
+async def run(args):
+    ids = await seed(users=args.users, posts=args.hot_posts, likes=0)
+    events = make_events(ids["user_ids"], ids["post_ids"], args.events, args.hot_posts)
+    results = []
+    elapsed, commits = await per_request(events, args.concurrency)
+    results.append({"mode": "per-request", "events": len(events), "seconds": round(elapsed, 3), "commits": commits,
+                    "events_per_second": round(len(events) / elapsed, 1), "commits_per_second": round(commits / elapsed, 1)})
+    elapsed, commits = await write_behind(events, args.flush_interval_ms, args.max_events)
+    results.append({"mode": "write-behind", "events": len(events), "seconds": round(elapsed, 3), "commits": commits,
+                    "events_per_second": round(len(events) / elapsed, 1), "commits_per_second": round(commits / elapsed, 1)})
+    await database.engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--hot-posts", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--flush-interval-ms", type=int, default=200)
+    parser.add_argument("--max-events", type=int, default=500)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{'mode':>14} {'events/s':>10} {'commits':>8} {'commits/s':>10}")
+    for r in results:
+        print(f"{r['mode']:>14} {r['events_per_second']:>10} {r['commits']:>8} {r['commits_per_second']:>10}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Load test of the hot paths: login, create post, list posts and like, in-process.
+
+    DB_DRIVER=aiosqlite DB_NAME=bench.db python -m benchmarks.load --requests 2000 --concurrency 20 --json after.json
+    python -m benchmarks.load --compare before.json after.json
+
+Seeds the database (benchmarks/seed.py), then fires each scenario at the real app through httpx's
+ASGI transport: routing, auth, validation, the database and serialization are all measured,
+the network isn't. Reports p50/p95/p99 latency and requests per second per scenario. The JSON
+file records the git commit and settings next to the numbers, keep one per commit and --compare
+any two of them.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from app.config import settings
+from app.main import app
+from app.token import create_access_token
+from benchmarks.seed import BENCH_PASSWORD, seed
+
+METRICS = ["rps", "p50_ms", "p95_ms", "p99_ms"]
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    # nearest rank, on an already sorted list
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def scenarios(user_ids: list[int], post_ids: list[int], rng: random.Random) -> dict:
+    """name -> function(client) that sends one request of that scenario."""
+    tokens = {uid: {"Authorization": f"Bearer {create_access_token({'sub': str(uid)})}"} for uid in user_ids}
+
+    def login(client):
+        uid = rng.choice(user_ids)
+        return client.post("/login", data={"username": f"bench{uid}@example.com", "password": BENCH_PASSWORD})
+
+    def create_post(client):
+        return client.post("/posts", json={"title": "load test", "content": "benchmark post " * 10},
+                           headers=tokens[rng.choice(user_ids)])
+
+    def list_posts(client):
+        return client.get("/posts", params={"limit": 20}, headers=tokens[rng.choice(user_ids)])
+
+    def like(client):
+        # repeats answer 409 and count as handled, that's the duplicate path in production too
+        return client.post("/like", json={"post_id": rng.choice(post_ids), "dir": 1}, headers=tokens[rng.choice(user_ids)])
+
+    return {"login": login, "create_post": create_post, "list_posts": list_posts, "like": like}
+
+
+async def run_scenario(client, make_request, requests: int, concurrency: int) -> dict:
+    latencies, statuses = [], {}
+    errors = 0
+    queue = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in queue:
+            start = time.perf_counter()
+            try:
+                r = await make_request(client)
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+                if r.status_code >= 500:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(ordered, 50), 2),
+        "p95_ms": round(percentile(ordered, 95), 2),
+        "p99_ms": round(percentile(ordered, 99), 2),
+        "max_ms": round(ordered[-1], 2),
+        "errors": errors,
+        "statuses": {str(code): n for code, n in sorted(statuses.items())},
+    }
+
+
+async def run(args) -> dict:
+    async with app.router.lifespan_context(app):
+        ids = await seed(users=args.users, posts=args.posts, likes=args.likes)
+        rng = random.Random(args.seed)
+        chosen = [name.strip() for name in args.scenarios.split(",")]
+        makers = scenarios(ids["user_ids"], ids["post_ids"], rng)
+        results = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for name in chosen:
+                # a few requests first so pools, caches and lazy imports are warm
+                await run_scenario(client, makers[name], min(args.warmup, args.requests), args.concurrency)
+                requests = args.login_requests if name == "login" else args.requests
+                results[name] = await run_scenario(client, makers[name], requests, args.concurrency)
+    return {
+        "commit": git_commit(),
+        "at": datetime.now(timezone.utc).isoformat(),
+        "driver": settings.DB_DRIVER,
+        "settings": {key: getattr(settings, key) for key in (
+            "FAST_SERIALIZATION", "RESPONSE_CACHE_BACKEND", "LIKE_WRITE_BEHIND", "HASH_POOL_SIZE",
+            "ARGON2_TIME_COST", "ARGON2_MEMORY_COST", "DB_POOL_SIZE",
+        )},
+        "seed": {"users": args.users, "posts": args.posts, "likes": args.likes},
+        "scenarios": results,
+    }
+
+
+def print_results(report: dict) -> None:
+    print(f"commit {report['commit']}  driver {report['driver']}")
+    print(f"{'scenario':>12} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, r in report["scenarios"].items():
+        print(f"{name:>12} {r['rps']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9} {r['errors']:>7}")
+
+
+def compare(before_path: str, after_path: str) -> None:
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{before['commit']} -> {after['commit']}, change in %, for rps higher is better, for latency lower")
+    print(f"{'scenario':>12} " + " ".join(f"{m:>9}" for m in METRICS))
+    for name, new in after["scenarios"].items():
+        old = before["scenarios"].get(name)
+        if old is None:
+            continue
+        deltas = [f"{(new[m] - old[m]) / old[m] * 100:>+8.1f}%" if old[m] else f"{'n/a':>9}" for m in METRICS]
+        print(f"{name:>12} " + " ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--likes", type=int, default=10000)
+    parser.add_argument("--scenarios", default="login,create_post,list_posts,like")
+    parser.add_argument("--requests", type=int, default=2000, help="per scenario")
+    parser.add_argument("--login-requests", type=int, default=200, help="login is an argon2 verify each, it gets fewer")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1, help="random seed for picking users and posts")
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two saved runs and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    report = asyncio.run(run(args))
+    print_results(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
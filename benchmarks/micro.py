@@ -0,0 +1,68 @@
+"""Micro-benchmarks of the per-request building blocks, with pytest-benchmark.
+
+    pip install pytest-benchmark
+    DB_DRIVER=aiosqlite DB_NAME=bench.db ... python -m pytest benchmarks/micro.py --benchmark-json=micro.json
+    pytest-benchmark compare before.json micro.json
+
+Password hashing at the configured ARGON2_* cost, JWT encode/decode with and without the token
+cache, and serializing a page of posts both ways FAST_SERIALIZATION can go. Nothing here touches
+the database, the settings still have to load so the usual environment variables are needed.
+"""
+import jwt
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from pydantic_core import to_json
+
+from app import Pass_Hash_Algo
+from app.config import settings
+from app.schemas import PostPage
+from app.serialization import post_from_row
+from app.token import create_access_token, decode_access_token
+from benchmarks.serialization import make_inputs
+
+PASSWORD = "benchmark-password"
+
+
+@pytest.fixture(scope="module")
+def hashed():
+    return Pass_Hash_Algo.get_password_hash(PASSWORD)
+
+
+@pytest.fixture(scope="module")
+def token():
+    return create_access_token({"sub": "12345"})
+
+
+@pytest.fixture(scope="module")
+def rows():
+    return make_inputs(settings.PAGE_SIZE_DEFAULT)[1]
+
+
+def test_password_hash(benchmark):
+    benchmark.pedantic(Pass_Hash_Algo.get_password_hash, args=(PASSWORD,), rounds=10)
+
+
+def test_password_verify(benchmark, hashed):
+    assert benchmark.pedantic(Pass_Hash_Algo.verify_password, args=(PASSWORD, hashed), rounds=10)
+
+
+def test_jwt_encode(benchmark):
+    benchmark(create_access_token, {"sub": "12345"})
+
+
+def test_jwt_decode(benchmark, token):
+    # what every authenticated request paid before the token cache
+    benchmark(jwt.decode, token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
+def test_jwt_decode_cached(benchmark, token):
+    decode_access_token(token)
+    benchmark(decode_access_token, token)
+
+
+@pytest.mark.parametrize("fast", [False, True], ids=["validate", "construct"])
+def test_serialize_post_page(benchmark, monkeypatch, rows, fast):
+    monkeypatch.setattr(settings, "FAST_SERIALIZATION", fast)
+    benchmark(lambda: to_json(PostPage.model_construct(items=[post_from_row(r) for r in rows], next_cursor=None)))
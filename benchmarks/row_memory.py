@@ -0,0 +1,89 @@
+"""Memory per 10k rows for the list endpoints: full ORM entities against column projections.
+
+    DB_DRIVER=aiosqlite DB_NAME=bench.db python -m benchmarks.row_memory --rows 10000
+
+Measures the tracemalloc peak of running the query and building the response models,
+for GET /users/ and a page of GET /posts as big as --rows.
+"""
+import argparse
+import asyncio
+import json
+import tracemalloc
+
+from sqlalchemy import func, select
+
+from app import database
+from app.db_models import Post, User
+from app.schemas import PostResponse, UserResponse
+from app.serialization import post_from_row, post_rows_query, user_from_row, user_rows_query
+from benchmarks.seed import seed
+
+
+async def users_entities(db, rows):
+    result = await db.execute(select(User).limit(rows))
+    return [UserResponse.model_validate(u) for u in result.scalars().all()]
+
+
+async def users_projected(db, rows):
+    result = await db.execute(user_rows_query().limit(rows))
+    return [user_from_row(r) for r in result.all()]
+
+
+async def posts_entities(db, rows):
+    result = await db.execute(select(Post).limit(rows))
+    return [PostResponse.model_validate(p) for p in result.scalars().all()]
+
+
+async def posts_projected(db, rows):
+    result = await db.execute(post_rows_query().limit(rows))
+    return [post_from_row(r) for r in result.all()]
+
+
+async def measure(fn, rows):
+    # a fresh session each time, otherwise the identity map from the last run skews the next one
+    async with database.SessionLocal() as db:
+        await db.execute(select(1))
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        out = await fn(db, rows)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return len(out), peak
+
+
+async def run(rows):
+    if database.IS_SQLITE:
+        await database.create_all()
+    async with database.SessionLocal() as db:
+        users = (await db.execute(select(func.count()).select_from(User))).scalar()
+        posts = (await db.execute(select(func.count()).select_from(Post))).scalar()
+    if users < rows or posts < rows:
+        await seed(users=max(rows - users, 1), posts=max(rows - posts, 0), likes=0)
+
+    results = []
+    for name, fn in [("users entities", users_entities), ("users projected", users_projected),
+                     ("posts entities", posts_entities), ("posts projected", posts_projected)]:
+        count, peak = await measure(fn, rows)
+        results.append({"query": name, "rows": count, "peak_mib": round(peak / 2**20, 2),
+                        "mib_per_10k_rows": round(peak / 2**20 * 10000 / max(count, 1), 2)})
+    await database.engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.rows))
+    print(f"{'query':>16} {'rows':>7} {'MiB / 10k rows':>15}")
+    for r in results:
+        print(f"{r['query']:>16} {r['rows']:>7} {r['mib_per_10k_rows']:>15}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
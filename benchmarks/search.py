@@ -0,0 +1,123 @@
+"""Latency of GET /posts/search on a large corpus, against a naive ILIKE scan of the same table.
+
+    DB_DRIVER=aiosqlite DB_NAME=bench.db python -m benchmarks.search --posts 1000000
+
+The corpus is generated from a zipf-ish vocabulary so a few words are in most posts and most words
+are rare, which is roughly what real text looks like and what makes the ranking do some work.
+Loading 1M posts takes a few minutes, pass --skip-load to rerun the queries on an existing corpus.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import func, insert, or_, select
+
+from app import database
+from app.db_models import Post
+from app.main import app
+from app.token import create_access_token
+from benchmarks.seed import BATCH, seed
+
+VOCABULARY = [f"word{n}" for n in range(20000)]
+# (label, query): a word in most posts, a mid frequency one, a rare one, and a two word query
+QUERIES = [("common", "word1"), ("medium", "word300"), ("rare", "word15000"), ("two words", "word2 word40")]
+
+
+def corpus(posts: int, owner_ids: list[int]):
+    rng = random.Random(7)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+    now = datetime.now(timezone.utc)
+    for n in range(posts):
+        words = rng.choices(VOCABULARY, cum_weights=cum_weights, k=40)
+        created = now - timedelta(seconds=posts - n)
+        yield {"owner_id": rng.choice(owner_ids), "title": " ".join(words[:5]), "content": " ".join(words[5:]),
+               "created_at": created, "updated_at": created}
+
+
+async def load(posts: int):
+    ids = await seed(users=100, posts=0, likes=0)
+    async with database.SessionLocal() as db:
+        batch = []
+        for row in corpus(posts, ids["user_ids"]):
+            batch.append(row)
+            if len(batch) == BATCH:
+                await db.execute(insert(Post), batch)
+                batch = []
+        if batch:
+            await db.execute(insert(Post), batch)
+        await db.commit()
+    return ids["user_ids"][0]
+
+
+async def timed(fn, runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summary(label, kind, timings):
+    ordered = sorted(timings)
+    return {"query": label, "kind": kind, "runs": len(timings), "p50_ms": round(statistics.median(ordered), 2),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2)}
+
+
+async def run(args):
+    async with app.router.lifespan_context(app):
+        if args.skip_load:
+            async with database.SessionLocal() as db:
+                user_id = (await db.execute(select(func.min(Post.owner_id)))).scalar()
+        else:
+            start = time.perf_counter()
+            user_id = await load(args.posts)
+            print(f"loaded {args.posts} posts in {time.perf_counter() - start:.1f}s")
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+
+        results = []
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for label, q in QUERIES:
+                async def search(q=q):
+                    r = await client.get("/posts/search", params={"q": q, "limit": 20}, headers=headers)
+                    r.raise_for_status()
+
+                async def scan(q=q):
+                    # what search used to mean: a substring match over every row, newest first
+                    terms = [or_(Post.title.ilike(f"%{word}%"), Post.content.ilike(f"%{word}%")) for word in q.split()]
+                    async with database.SessionLocal() as db:
+                        await db.execute(select(Post.id).where(*terms).order_by(Post.created_at.desc()).limit(20))
+
+                results.append(summary(label, "search", await timed(search, args.runs)))
+                if not args.skip_scan:
+                    results.append(summary(label, "ilike scan", await timed(scan, max(1, args.runs // 10))))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--skip-load", action="store_true", help="query the posts already in the database")
+    parser.add_argument("--skip-scan", action="store_true", help="don't time the ILIKE baseline")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{'query':>10} {'kind':>11} {'runs':>5} {'p50 ms':>9} {'p95 ms':>9}")
+    for r in results:
+        print(f"{r['query']:>10} {r['kind']:>11} {r['runs']:>5} {r['p50_ms']:>9} {r['p95_ms']:>9}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
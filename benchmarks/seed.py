@@ -0,0 +1,81 @@
+"""Seeds a throwaway database with users, posts and likes for the benchmarks.
+
+    DB_DRIVER=aiosqlite DB_NAME=bench.db python -m benchmarks.seed --users 1000 --posts 10000 --likes 50000
+
+Every seeded user can log in as bench<N>@example.com with BENCH_PASSWORD.
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, insert, select, text
+
+from app import database
+from app.Pass_Hash_Algo import get_password_hash
+from app.db_models import Likes, Post, User
+
+BENCH_PASSWORD = "benchmark-password"
+BATCH = 5000
+
+
+async def seed(users: int, posts: int, likes: int) -> dict:
+    """Inserts the rows and returns the new user and post ids."""
+    if database.IS_SQLITE:
+        await database.create_all()
+    rng = random.Random(42)
+    # one hash for everybody, seeding shouldn't take an argon2 per user
+    hashed = get_password_hash(BENCH_PASSWORD)
+    now = datetime.now(timezone.utc)
+
+    async with database.SessionLocal() as db:
+        first_id = (await db.execute(select(func.coalesce(func.max(User.id), 0)))).scalar() + 1
+        user_ids = list(range(first_id, first_id + users))
+        rows = [
+            {"id": uid, "username": f"bench{uid}", "email": f"bench{uid}@example.com", "hashed_password": hashed,
+             "full_name": f"Bench User {uid}", "created_at": now, "updated_at": now}
+            for uid in user_ids
+        ]
+        for i in range(0, len(rows), BATCH):
+            await db.execute(insert(User), rows[i:i + BATCH])
+
+        rows = []
+        for n in range(posts):
+            created = now - timedelta(seconds=posts - n)
+            rows.append({"owner_id": rng.choice(user_ids), "title": f"post {n}", "content": f"benchmark post number {n} " * 5,
+                         "created_at": created, "updated_at": created})
+        post_ids = []
+        for i in range(0, len(rows), BATCH):
+            result = await db.execute(insert(Post).returning(Post.id), rows[i:i + BATCH])
+            post_ids.extend(result.scalars().all())
+
+        pairs = set()
+        while post_ids and len(pairs) < min(likes, len(post_ids) * len(user_ids)):
+            pairs.add((rng.choice(post_ids), rng.choice(user_ids)))
+        rows = [{"post_id": p, "user_id": u} for p, u in pairs]
+        for i in range(0, len(rows), BATCH):
+            await db.execute(insert(Likes), rows[i:i + BATCH])
+        if pairs:
+            await db.execute(text("UPDATE posts SET like_count = (SELECT count(*) FROM likes WHERE likes.post_id = posts.id)"))
+        await db.commit()
+    return {"user_ids": user_ids, "post_ids": post_ids}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--likes", type=int, default=50000)
+    args = parser.parse_args()
+
+    async def run():
+        ids = await seed(args.users, args.posts, args.likes)
+        await database.engine.dispose()
+        return ids
+
+    ids = asyncio.run(run())
+    print(f"seeded {len(ids['user_ids'])} users and {len(ids['post_ids'])} posts")
+
+
+if __name__ == "__main__":
+    main()
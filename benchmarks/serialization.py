@@ -0,0 +1,101 @@
+"""Serialization time per 1k posts for the post listings, before and after the fast path.
+
+    python -m benchmarks.serialization --posts 1000 --repeat 50
+
+  validate+jsonable   what FastAPI does with response_model=list[PostResponse] and ORM objects:
+                      from_attributes validation, jsonable_encoder, json.dumps
+  validate+to_json    ORM objects validated into PostPage, then pydantic's own JSON encoder
+  rows+validate       projected row tuples validated into the models -> pydantic JSON encoder
+  rows+construct      FAST_SERIALIZATION: row tuples -> model_construct -> pydantic JSON encoder
+
+No database involved, the inputs are built in memory so only serialization is timed.
+"""
+import argparse
+import json
+import statistics
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+from pydantic_core import to_json
+
+from app.config import settings
+from app.db_models import Post, User
+from app.schemas import PostPage
+from app.serialization import POST_ROW_COLUMNS, post_from_row
+
+class Row(namedtuple("Row", [c.key for c in POST_ROW_COLUMNS])):
+    """Stands in for a sqlalchemy Row, attribute access plus the _mapping post_from_row reads."""
+
+    @property
+    def _mapping(self):
+        return self._asdict()
+
+
+def make_inputs(count):
+    now = datetime.now(timezone.utc)
+    owners = [User(id=i, username=f"user{i}", email=f"user{i}@example.com", full_name=f"User {i}") for i in range(50)]
+    posts, rows = [], []
+    for i in range(count):
+        owner = owners[i % len(owners)]
+        post = Post(id=i, owner_id=owner.id, title=f"post {i}", content="lorem ipsum dolor sit amet " * 8,
+                    like_count=i % 97, created_at=now, owner=owner)
+        posts.append(post)
+        rows.append(Row(post.id, post.owner_id, post.title, post.content, post.like_count, post.created_at,
+                        owner.username, owner.full_name, owner.email))
+    return posts, rows
+
+
+def validate_jsonable(posts, rows):
+    page = PostPage.model_validate({"items": posts, "next_cursor": None})
+    return json.dumps(jsonable_encoder(page)).encode()
+
+
+def validate_to_json(posts, rows):
+    return to_json(PostPage(items=posts, next_cursor=None))
+
+
+def rows_validate(posts, rows):
+    settings.FAST_SERIALIZATION = False
+    return to_json(PostPage.model_construct(items=[post_from_row(r) for r in rows], next_cursor=None))
+
+
+def rows_construct(posts, rows):
+    settings.FAST_SERIALIZATION = True
+    return to_json(PostPage.model_construct(items=[post_from_row(r) for r in rows], next_cursor=None))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    posts, rows = make_inputs(args.posts)
+    # all of them have to agree on the output before their timings mean anything
+    assert json.loads(validate_jsonable(posts, rows)) == json.loads(rows_construct(posts, rows))
+
+    results = []
+    for name, fn in [("validate+jsonable", validate_jsonable), ("validate+to_json", validate_to_json),
+                     ("rows+validate", rows_validate), ("rows+construct", rows_construct)]:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            fn(posts, rows)
+            timings.append(time.perf_counter() - start)
+        median = statistics.median(timings)
+        results.append({"path": name, "posts": args.posts, "median_ms": round(median * 1000, 3),
+                        "ms_per_1k_posts": round(median * 1000 * 1000 / args.posts, 3)})
+
+    print(f"{'path':>18} {'ms / 1k posts':>14}")
+    for r in results:
+        print(f"{r['path']:>18} {r['ms_per_1k_posts']:>14}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import os
+import tempfile
+
+# the settings are read when app.config is imported, so this has to run before any app import.
+# The tests run on the sqlite stand-in, a fresh file per run
+os.environ.setdefault("DB_DRIVER", "aiosqlite")
+os.environ.setdefault("DB_NAME", os.path.join(tempfile.mkdtemp(prefix="fastapi-tests-"), "test.db"))
+for name, value in {"DB_HOST": "localhost", "DB_PORT": "5432", "DB_USER": "test", "DB_PASSWORD": "test",
+                    "ALGORITHM": "HS256", "SECRET_KEY": "test-secret-key-of-at-least-32-bytes",
+                    "ACCESS_TOKEN_EXPIRE_MINUTES": "30", "ARGON2_TIME_COST": "1", "ARGON2_MEMORY_COST": "1024"}.items():
+    os.environ.setdefault(name, value)
+
+import pytest
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
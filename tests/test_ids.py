@@ -0,0 +1,71 @@
+"""Snowflake user ids (user-021): unique and ordered across threads, safe when the clock steps
+back, and one leased worker id per process."""
+import threading
+import time
+
+import pytest
+
+from app import database, ids
+from app.id_leases import WorkerIdLease
+
+
+@pytest.fixture
+def fresh_generator(monkeypatch):
+    # new_id() builds a generator of its own again, whatever earlier tests left behind
+    monkeypatch.setattr(ids, "_generator", None)
+    monkeypatch.setattr(ids, "_generator_pid", None)
+    monkeypatch.setattr(ids, "_valid_until", None)
+
+
+def test_ids_from_many_threads_are_unique_and_ordered_per_thread(fresh_generator):
+    per_thread = [[] for _ in range(8)]
+
+    def work(out):
+        for _ in range(20000):
+            out.append(ids.new_id())
+
+    threads = [threading.Thread(target=work, args=(out,)) for out in per_thread]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    every_id = [i for out in per_thread for i in out]
+    assert len(set(every_id)) == len(every_id) == 8 * 20000
+    for out in per_thread:
+        assert out == sorted(out) and len(set(out)) == len(out)
+
+
+def test_clock_stepping_back_does_not_repeat_an_id(monkeypatch):
+    # 10s after the epoch, then NTP steps the clock back a whole second, then it catches up
+    ms = [10_000, 10_000, 9_000, 9_000, 9_001, 10_001]
+    clock = iter((ids.EPOCH_MS + m) * 1_000_000 for m in ms)
+    monkeypatch.setattr(ids.time, "time_ns", lambda: next(clock))
+
+    generator = ids.IdGenerator(worker_id=7)
+    made = [generator.next_id() for _ in ms]
+
+    assert len(set(made)) == len(made)
+    assert made == sorted(made)
+    # the ones made while the clock was behind stay on the last millisecond seen
+    assert {i >> (ids.WORKER_BITS + ids.SEQUENCE_BITS) for i in made[:5]} == {10_000}
+
+
+@pytest.mark.anyio
+async def test_leases_hand_out_distinct_worker_ids(fresh_generator):
+    await database.create_all()
+    first, second = WorkerIdLease(lease_seconds=60), WorkerIdLease(lease_seconds=60)
+    await first.start()
+    await second.start()
+    try:
+        assert first.worker_id != second.worker_id
+        # the last lease taken is the one new_id() uses
+        assert ids.new_id() >> ids.SEQUENCE_BITS & ids.MAX_WORKER_ID == second.worker_id
+
+        # past the lease another process may own the worker id, so no more ids from it
+        ids._valid_until = time.monotonic() - 1
+        with pytest.raises(RuntimeError):
+            ids.new_id()
+    finally:
+        await first.close()
+        await second.close()
@@ -0,0 +1,82 @@
+"""A page of posts costs the same number of statements whatever its size: the owners come
+with the posts (user-002), not one lookup per post."""
+from contextlib import contextmanager
+
+import httpx
+import pytest
+from sqlalchemy import event, select
+
+from app import database
+from app.db_models import Post
+from app.main import app
+from app.routers.post import keyset_page
+from app.token import create_access_token
+from benchmarks.seed import seed
+
+pytestmark = pytest.mark.anyio
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(database.engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(database.engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+async def seeded():
+    # 60 posts, more than the 50 post page, spread over 7 owners so a lazy owner load would show
+    # up as extra statements
+    return await seed(users=7, posts=60, likes=0)
+
+
+async def test_post_owner_is_loaded_with_the_posts(seeded):
+    counts = {}
+    for limit in (1, 50):
+        async with database.SessionLocal() as db:
+            with count_statements() as statements:
+                result = await db.execute(select(Post).order_by(Post.id).limit(limit))
+                posts = result.unique().scalars().all()
+                # a lazy Post.owner would need a statement per owner here (or fail outright under asyncio)
+                owners = {post.owner.username for post in posts}
+        assert len(posts) == limit
+        assert owners
+        counts[limit] = len(statements)
+    assert counts == {1: 1, 50: 1}
+
+
+async def test_keyset_page_is_one_statement(seeded):
+    counts = {}
+    for limit in (1, 50):
+        async with database.SessionLocal() as db:
+            with count_statements() as statements:
+                page = await keyset_page(db, limit, None)
+                # reading the owners must not go back to the database either
+                owners = {item.owner.username for item in page.items}
+        assert len(page.items) == limit
+        assert owners
+        counts[limit] = len(statements)
+    assert counts == {1: 1, 50: 1}
+
+
+async def test_feed_statement_count_does_not_grow_with_page_size(seeded):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(seeded['user_ids'][0])})}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # the first request fills the principal cache, that lookup isn't part of a page
+        assert (await client.get("/posts", params={"limit": 1}, headers=headers)).status_code == 200
+        counts = {}
+        for limit in (1, 50):
+            with count_statements() as statements:
+                response = await client.get("/posts", params={"limit": limit, "include_liked": True}, headers=headers)
+            assert response.status_code == 200
+            assert len(response.json()["items"]) == limit
+            counts[limit] = len(statements)
+    assert counts[1] == counts[50]